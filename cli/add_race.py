@@ -8,8 +8,7 @@ from miscellaneous import main_function
 from sqlobject import SQLObjectNotFound
 from sys import stderr, stdin
 from xcanalyze.models import Distances, Races, Venues
-from yaml import load
-from yaml.scanner import ScannerError
+from xcanalyze.records import read_records, RecordError
 
 from common import connect, ConnectionError, OptionParser
 
@@ -61,13 +60,13 @@ def parse_arguments(arguments):
 
 @main_function(parse_arguments)
 def main(options, (name, date, venue)):
-    """Reads race results from a YAML file taken from stdin and saves them to
+    """Reads race results in YAML or JSON Lines from stdin and saves them to
     the database based on the command-line arguments."""
     try:
-        results = load(stdin.read())
+        results = list(read_records(stdin)[1])
     except KeyboardInterrupt:
         return 1
-    except ScannerError, error:
+    except RecordError, error:
         print >> stderr, error
         return 1
     Races.create(name, date, venue, options.mens_distance,
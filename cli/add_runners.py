@@ -5,8 +5,7 @@ from miscellaneous import main_function
 from sqlobject import SQLObjectNotFound
 from sys import stderr, stdin
 from xcanalyze.models import Runners, Schools
-from yaml import load
-from yaml.scanner import ScannerError
+from xcanalyze.records import read_records, RecordError
 
 from common import connect, ConnectionError, gender_callback, OptionParser
 
@@ -28,23 +27,20 @@ def parse_arguments(arguments):
 
 @main_function(parse_arguments)
 def main(options, arguments):
-    """Read a YAML description of the runners from stdin, and save it to the
-    database."""
+    """Read a description of the runners in YAML or JSON Lines from stdin, and
+    save it to the database."""
     try:
-        runners = load(stdin.read())
+        runners = list(read_records(stdin)[1])
         verify(runners, options)
     except KeyboardInterrupt:
         return 1
-    except ScannerError, error:
+    except RecordError, error:
         print >> stderr, error
         return 1
     except (SQLObjectNotFound, VerificationError), error:
         print >> stderr, error
         return 1
-    for runner in runners:
-        Runners.create(runner["given_name"], runner["surname"],
-                       runner["school"], runner["gender"], runner["year"],
-                       runner["nicknames"], runner["competition_year"])
+    Runners.create_many(runners)
 
 def verify(runners, options):
     """Check that all runners have the fields required by Runners.create().
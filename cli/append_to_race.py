@@ -7,8 +7,7 @@ from miscellaneous import main_function
 from optparse import OptionParser
 from sys import stderr, stdin
 from xcanalyze.models import Races
-from yaml import load
-from yaml.scanner import ScannerError
+from xcanalyze.records import read_records, RecordError
 
 from common import connect, ConnectionError, OptionParser
 
@@ -33,13 +32,13 @@ def parse_arguments(arguments):
 
 @main_function(parse_arguments)
 def main(options, race):
-    """Read YAML race results from stdin and save them to the specified
-    race."""
+    """Read race results in YAML or JSON Lines from stdin and save them to the
+    specified race."""
     try:
-        results = load(stdin.read())
+        results = list(read_records(stdin)[1])
     except KeyboardInterrupt:
         return 1
-    except ScannerError, error:
+    except RecordError, error:
         print >> stderr, error
         return 1
     Races.add_results(race, results)
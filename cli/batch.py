@@ -0,0 +1,109 @@
+#!/usr/bin/python
+
+"""Run many of the scripts in this directory in a single process, so that
+they share one connection to the database and connecting, checking the
+database and loading the --in-memory tables are done only once.  Each line of
+the given files, or of stdin, is a command, such as
+
+    show_runner.py 1402
+    show_team.py -y 2009 "Puget Sound"
+
+Blank lines and lines beginning with # are skipped.  Commands are run as they
+are read, so a long-lived process can be fed commands through a pipe.  The
+tables loaded by --in-memory are shared by the commands that follow, and do
+not see changes made by earlier commands of the batch.  The versions that
+keep the name cache fresh are read again for every command, as other programs
+may have changed the tables in the meantime, as is whether the tables added by
+migrate.py exist."""
+
+from miscellaneous import main_function
+from os import environ as environment
+from os.path import abspath, dirname, join
+import re
+from shlex import split
+import sys
+from sys import stderr, stdin, stdout
+from traceback import print_exc
+from xcanalyze.models import SeasonsBests, TableVersions
+
+from common import CNX_ENV_VAR, OptionParser
+
+SCRIPT = re.compile(r"^(\w+)(\.py)?$")
+
+def parse_arguments(arguments):
+    """Parse command line arguments.  Returns the tuple (options, files)."""
+    option_parser = OptionParser("%prog [options] [FILE...]")
+    options, arguments = option_parser.parse_args(arguments[1:])
+    if options.server is not None:
+        #The commands read the server from the environment by default
+        environment[CNX_ENV_VAR] = options.server
+    try:
+        files = [open(path) for path in arguments] or [stdin]
+    except EnvironmentError, error:
+        option_parser.error(error)
+    return options, files
+
+@main_function(parse_arguments)
+def main(options, files):
+    """Run each command in turn, reporting those that fail."""
+    failed = 0
+    for line in command_lines(files):
+        try:
+            command = split(line, comments=True)
+        except ValueError, error:
+            print >> stderr, "%s: %s" % (line.strip(), error)
+            failed += 1
+            continue
+        if len(command) == 0:
+            continue
+        if run(command) not in (None, 0):
+            failed += 1
+        stdout.flush()
+    if failed > 0:
+        print >> stderr, "%d commands failed." % failed
+        return 1
+
+def command_lines(files):
+    """Generate each line of the files.  Lines are read one at a time, so
+    that each is available as soon as it is written to a pipe."""
+    for stream in files:
+        for line in iter(stream.readline, ""):
+            yield line
+
+def run(command):
+    """Run the command, a list of the script name and its arguments.  Returns
+    the exit status of the script."""
+    match = SCRIPT.match(command[0])
+    if match is None or match.group(1) == "batch" or \
+            not is_script(match.group(1)):
+        print >> stderr, "%s is not a script." % command[0]
+        return 1
+    arguments = [match.group(1) + ".py"] + command[1:]
+    SeasonsBests.forget()
+    TableVersions.forget()
+    #Usage messages name the program after sys.argv
+    saved, sys.argv = sys.argv, arguments
+    try:
+        script = __import__(match.group(1))
+        return script.main(arguments)
+    except SystemExit, exit:
+        return exit.code
+    except Exception:
+        stdout.flush()
+        print_exc()
+        return 1
+    finally:
+        sys.argv = saved
+
+def is_script(name):
+    """Whether the module of the given name in this directory is a script
+    rather than a library, which is to say whether it begins with a #!
+    line."""
+    try:
+        with open(join(dirname(abspath(__file__)), name + ".py")) as module:
+            return module.read(2) == "#!"
+    except EnvironmentError:
+        return False
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/python
+
+"""Measure how many results and runners per second can be saved to the
+database one row at a time and with the bulk loaders used by add_race,
+append_to_race and add_runners."""
+
+from datetime import date
+from miscellaneous import main_function
+from optparse import OptionParser
+from os import close, remove
+from random import gauss
+from sqlobject import connectionForURI as connection_for_URI, sqlhub
+from tempfile import mkstemp
+from time import time as now
+from xcanalyze.models import Affiliations, Meets, Races, Results, Runners
+from xcanalyze.models import Schools, tables
+
+def parse_arguments(arguments):
+    """Parse command line arguments.  Returns the tuple (options,
+    arguments)."""
+    option_parser = OptionParser()
+    option_parser.add_option("-n", "--rows", default=5000, type="int",
+                             help="The number of results and of runners to "
+                             "save with each method.")
+    return option_parser.parse_args(arguments[1:])
+
+@main_function(parse_arguments)
+def main(options, arguments):
+    """Save the same runners and results to a scratch SQLite database with
+    each method and report the rate of each."""
+    handle, path = mkstemp(suffix=".db")
+    close(handle)
+    try:
+        sqlhub.processConnection = connection_for_URI("sqlite://" + path)
+        for table in tables:
+            table.createTable()
+        school = Schools(name="Benchmark", nicknames=None, type="College",
+                         conference=None)
+        runners = [{"given_name": "Runner", "surname": str(i),
+                    "school": school, "gender": "M"}
+                   for i in xrange(options.rows)]
+        start = now()
+        create_runners_row_by_row(runners)
+        single = now() - start
+        start = now()
+        runner_ids = [runner.id for runner in Runners.create_many(runners)]
+        bulk = now() - start
+        report("Runners", len(runners), single, bulk)
+        results = [{"runner_id": runner_id, "time": gauss(1600, 60)}
+                   for runner_id in runner_ids]
+        single = time_loader(row_by_row, results)
+        bulk = time_loader(Races.add_results, results)
+        report("Results", len(results), single, bulk)
+    finally:
+        sqlhub.processConnection.close()
+        remove(path)
+
+def report(name, rows, single, bulk):
+    """Print the rates of saving the rows one at a time and in bulk."""
+    print name
+    print "  Row by row: %10.0f rows/s" % (rows / single)
+    print "  Bulk:       %10.0f rows/s" % (rows / bulk)
+    print "  Speedup:    %10.1fx" % (single / bulk)
+
+def create_runners_row_by_row(runners):
+    """Save each runner and their affiliation with their own INSERTs, as
+    add_runners once did."""
+    for runner in runners:
+        new_runner = Runners(given_name=runner["given_name"],
+                             surname=runner["surname"],
+                             gender=runner["gender"], nicknames=None,
+                             year=None)
+        Affiliations(runner=new_runner, school=runner["school"],
+                     year=date.today().year)
+
+def row_by_row(race, results):
+    """Save each result with its own INSERT, as add_results once did."""
+    for result in results:
+        Results(runner=result["runner_id"], race=race, time=result["time"])
+
+def time_loader(loader, results):
+    """Save the results to a new race with the loader, returning the number of
+    seconds taken."""
+    race = Races(meet=Meets(name="Benchmark"), date=date.today(), venue=None,
+                 mens_distance=8000, womens_distance=6000, comments=None)
+    start = now()
+    loader(race, results)
+    return now() - start
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""A cache of name lookups that persists between runs of the scripts in this
+directory.  The cache is a small SQLite file mapping (database URI, table,
+name) to an ID number, along with the version of the table at the time the ID
+was found, so entries go stale as soon as the table changes."""
+
+from os import environ as environment, makedirs
+from os.path import dirname, expanduser, isdir
+import sqlite3
+
+CACHE_ENV_VAR = "XCA_NAME_CACHE"
+DEFAULT_PATH = "~/.xcanalyze/names.db"
+
+def default_path():
+    """Get the path of the cache file, which may be overridden by the
+    environment variable XCA_NAME_CACHE."""
+    return expanduser(environment.get(CACHE_ENV_VAR, DEFAULT_PATH))
+
+class NameCache(object):
+    """Stores the ID numbers found by name lookups.  The cache file is opened
+    the first time it is used; if it cannot be opened, every lookup misses."""
+
+    def __init__(self, path=None):
+        self.path = path
+        self._connection = None
+        self.disabled = False
+
+    @property
+    def connection(self):
+        """The connection to the cache file, or None if it is unavailable."""
+        if self._connection is None and not self.disabled:
+            path = self.path if self.path is not None else default_path()
+            try:
+                if not isdir(dirname(path)):
+                    makedirs(dirname(path))
+                self._connection = sqlite3.connect(path)
+                self._connection.execute("CREATE TABLE IF NOT EXISTS names "
+                                         "(uri TEXT, table_name TEXT, "
+                                         "name TEXT, id INTEGER, "
+                                         "version INTEGER, PRIMARY KEY "
+                                         "(uri, table_name, name))")
+            except (OSError, sqlite3.Error):
+                self.disabled = True
+                self._connection = None
+        return self._connection
+
+    def get(self, uri, table, name, version):
+        """Get the ID cached for the name, or None if there is none or it was
+        cached at a different version of the table."""
+        if self.connection is None:
+            return None
+        try:
+            found = self.connection.execute("SELECT id FROM names WHERE uri = "
+                                            "? AND table_name = ? AND name = ? "
+                                            "AND version = ?",
+                                            (uri, table, name, version))
+            row = found.fetchone()
+        except sqlite3.Error:
+            return None
+        return row[0] if row is not None else None
+
+    def put(self, uri, table, name, version, id_):
+        """Cache the ID found for the name at the given version of the
+        table."""
+        if self.connection is None:
+            return
+        try:
+            self.connection.execute("INSERT OR REPLACE INTO names VALUES "
+                                    "(?, ?, ?, ?, ?)",
+                                    (uri, table, name, id_, version))
+            self.connection.commit()
+        except sqlite3.Error:
+            pass
+
+name_cache = NameCache()
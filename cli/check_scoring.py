@@ -0,0 +1,63 @@
+#!/usr/bin/python
+
+"""Check that RaceResults.score_vectorized, used by show_race and predict,
+scores random races exactly as RaceResults.score does: the same places and
+points for every finisher, and the same Teams in the same order."""
+
+from hytek import Finisher, RaceTime
+from miscellaneous import main_function
+from optparse import OptionParser
+from random import choice, randint, seed, uniform
+from xcanalyze.scoring import RaceResults
+
+def parse_arguments(arguments):
+    """Parse command line arguments.  Returns the tuple (options,
+    arguments)."""
+    option_parser = OptionParser()
+    option_parser.add_option("-n", "--races", default=400, type="int",
+                             help="The number of random races to score.")
+    option_parser.add_option("--seed", default=1, type="int",
+                             help="The seed of the random races.")
+    return option_parser.parse_args(arguments[1:])
+
+@main_function(parse_arguments)
+def main(options, arguments):
+    """Score each random race both ways and report the first difference."""
+    seed(options.seed)
+    for i in xrange(options.races):
+        race = random_race()
+        scored = summarize(race, RaceResults.score)
+        vectorized = summarize(race, RaceResults.score_vectorized)
+        if scored != vectorized:
+            print "Race %d is scored differently:" % i
+            print "  score:            %r" % (scored,)
+            print "  score_vectorized: %r" % (vectorized,)
+            return 1
+    print "%d races scored identically." % options.races
+
+def random_race():
+    """A race of up to 120 finishers from up to 12 teams, some unattached,
+    with times rounded so that many are tied.  The times are not all equal,
+    as score does not place such a race."""
+    teams = [None] + ["Team %d" % i for i in xrange(randint(1, 12))]
+    while True:
+        race = [(RaceTime(round(uniform(1500, 1560), choice([0, 1, 2]))),
+                 choice(teams)) for i in xrange(randint(2, 120))]
+        if len(set(time for time, team in race)) > 1:
+            return race
+
+def summarize(race, score):
+    """Score a copy of the race with the given method.  Returns the name,
+    place and points of each finisher and the attributes of each Team."""
+    results = RaceResults([Finisher("Runner %d" % i, time, 2010, team)
+                           for i, (time, team) in enumerate(race)])
+    score(results)
+    finishers = [(result.name, result.place, result.points)
+                 for result in results.results]
+    teams = [(team.name, team.place, team.score, team.top_five,
+              team.top_seven, [runner.name for runner in team.finishers])
+             for team in results.scores]
+    return finishers, teams
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,658 @@
+"""A read-only, column-oriented copy of the database held in memory.  Each
+table is a set of NumPy arrays, one per column, and every foreign key is
+stored as the row number of the referenced row, so queries are answered
+with array operations instead of round trips to the database."""
+
+from collections import namedtuple
+from datetime import date
+from extensions.collections import OrderedDict
+
+import numpy
+from sqlobject import SQLObjectNotFound
+from sqlobject.sqlbuilder import Select
+
+from models import Affiliations, CatalogEntry, Conferences, Distances, Meets
+from models import PerformanceHistory, Races, Results, RosterEntry, Runners
+from models import SeasonsBest
+from models import Schools, TooManyObjectsError, Venues
+from scoring import RaceTime
+import snapshot
+
+class Columns(object):
+    """A table stored as a dictionary of equally long NumPy arrays."""
+
+    def __init__(self, columns):
+        self.columns = columns
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def __len__(self):
+        return len(self.columns["id"])
+
+    def where(self, mask):
+        """The rows selected by the given boolean array or array of row
+        numbers."""
+        return Columns(dict((name, column[mask])
+                            for name, column in self.columns.iteritems()))
+
+    def row_of(self, id_):
+        """The row number of the row with the given id, or -1 if there is
+        none."""
+        return row_numbers(self["id"], numpy.array([id_]))[0]
+
+def first_of_each(keys):
+    """Given a sorted array of keys, a boolean array marking the first
+    occurrence of each key."""
+    first = numpy.ones(len(keys), dtype=bool)
+    first[1:] = keys[1:] != keys[:-1]
+    return first
+
+def row_numbers(ids, references):
+    """Convert an array of references to the ids in the given sorted array to
+    row numbers, with -1 for references that do not resolve."""
+    if len(ids) == 0:
+        return numpy.zeros(len(references), dtype=int) - 1
+    rows = numpy.searchsorted(ids, references)
+    rows = numpy.minimum(rows, len(ids) - 1)
+    return numpy.where(ids[rows] == references, rows, -1)
+
+def to_ordinal(value):
+    """Convert a date, or a string of the form YYYY-MM-DD, to a day number."""
+    if isinstance(value, basestring):
+        value = date(*map(int, value[:10].split("-")))
+    return value.toordinal()
+
+class Conference(namedtuple("Conference", "id name abbreviation")):
+    """A row of the conferences table."""
+    __slots__ = ()
+
+class Distance(namedtuple("Distance", "id mens_distance womens_distance")):
+    """A row of the distances table."""
+    __slots__ = ()
+
+class Meet(namedtuple("Meet", "id name")):
+    """A row of the meets table."""
+    __slots__ = ()
+
+class School(namedtuple("School",
+                        "id name nicknames type name_order conference")):
+    """A row of the schools table.  The conference is its id number."""
+    __slots__ = ()
+
+    full_name = Schools.full_name
+
+    def __hash__(self):
+        return hash(self.id)
+
+class Venue(namedtuple("Venue", "id name city state elevation")):
+    """A row of the venues table."""
+    __slots__ = ()
+
+class Race(object):
+    """A row of the races table, with its meet and venue, which behaves like
+    an instance of Races."""
+
+    def __init__(self, id_, meet, date_, venue, mens_distance,
+                 womens_distance):
+        self.id = id_
+        self.meet = meet
+        self.date = date_
+        self.venue = venue
+        self.mens_distance = mens_distance
+        self.womens_distance = womens_distance
+
+    distance = Races.distance.im_func
+
+class Runner(namedtuple("Runner",
+                        "id surname given_name nicknames gender year")):
+    """A row of the runners table."""
+    __slots__ = ()
+
+    given_names = Runners.given_names
+    name = Runners.name
+
+    def __hash__(self):
+        return hash(self.id)
+
+class Result(namedtuple("Result", "runner race time")):
+    """A row of the results table, with its runner and race."""
+    __slots__ = ()
+
+class ColumnStore(object):
+    """The results, races, runners, affiliations, schools, conferences,
+    distances, meets and venues tables in column-oriented form.  The query
+    methods mirror those of the models, returning the same data structures,
+    with rows such as Race and Runner standing in for model instances."""
+
+    def __init__(self, tables):
+        self.tables = tables
+        for name, table in tables.iteritems():
+            setattr(self, name, table)
+        self._races = {}
+
+    @classmethod
+    def open(cls, path):
+        """Map the snapshot at the given path into memory.  Raises a
+        SnapshotError if the file is not a snapshot."""
+        tables = snapshot.read(path)
+        return cls(dict((name, Columns(columns))
+                        for name, columns in tables.iteritems()))
+
+    def save(self, path):
+        """Write the tables to a snapshot at the given path."""
+        snapshot.write(dict((name, table.columns)
+                            for name, table in self.tables.iteritems()),
+                       path)
+
+    @classmethod
+    def load(cls, connection=None):
+        """Read every table from the database, with one query per table."""
+        if connection is None:
+            connection = Results._connection
+        def read(model, names):
+            items = [getattr(model.q, name) for name in ["id"] + names]
+            select = Select(items, orderBy=model.q.id)
+            rows = connection.queryAll(connection.sqlrepr(select))
+            return zip(*rows) if rows else [()] * len(items)
+        tables = {}
+        ids, names, abbreviations = read(Conferences, ["name",
+                                                       "abbreviation"])
+        tables["conferences"] = Columns({"id": numpy.array(ids, dtype=int),
+                                         "name": strings(names),
+                                         "abbreviation":
+                                         strings(abbreviations)})
+        ids, mens_distances, womens_distances = \
+                read(Distances, ["mens_distance", "womens_distance"])
+        tables["distances"] = Columns({"id": numpy.array(ids, dtype=int),
+                                       "mens_distance":
+                                       integers(mens_distances),
+                                       "womens_distance":
+                                       integers(womens_distances)})
+        ids, names = read(Meets, ["name"])
+        tables["meets"] = Columns({"id": numpy.array(ids, dtype=int),
+                                   "name": strings(names)})
+        ids, names, cities, states, elevations = \
+                read(Venues, ["name", "city", "state", "elevation"])
+        tables["venues"] = Columns({"id": numpy.array(ids, dtype=int),
+                                    "name": strings(names),
+                                    "city": strings(cities),
+                                    "state": strings(states),
+                                    "elevation": integers(elevations)})
+        ids, names, nicknames, types, name_orders, conferences = \
+                read(Schools, ["name", "nicknames", "type", "name_order",
+                               "conference"])
+        tables["schools"] = Columns({"id": numpy.array(ids, dtype=int),
+                                     "name": strings(names),
+                                     "nicknames": strings(nicknames),
+                                     "type": strings(types),
+                                     "name_order": numpy.array(name_orders,
+                                                               dtype=bool),
+                                     "conference": integers(conferences)})
+        ids, surnames, given_names, nicknames, genders, years = \
+                read(Runners, ["surname", "given_name", "nicknames", "gender",
+                               "year"])
+        tables["runners"] = Columns({"id": numpy.array(ids, dtype=int),
+                                     "surname": strings(surnames),
+                                     "given_name": strings(given_names),
+                                     "nicknames": strings(nicknames),
+                                     "gender": strings(genders),
+                                     "year": integers(years)})
+        ids, meets, dates, venues, mens_distances, womens_distances = \
+                read(Races, ["meet", "date", "venue", "mens_distance",
+                             "womens_distance"])
+        tables["races"] = Columns({"id": numpy.array(ids, dtype=int),
+                                   "meet": references(tables["meets"], meets),
+                                   "date": numpy.array(map(to_ordinal, dates),
+                                                       dtype=int),
+                                   "venue": references(tables["venues"],
+                                                       venues),
+                                   "mens_distance": integers(mens_distances),
+                                   "womens_distance":
+                                   integers(womens_distances)})
+        ids, runners, races, times = read(Results, ["runner", "race", "time"])
+        tables["results"] = Columns({"id": numpy.array(ids, dtype=int),
+                                     "runner": references(tables["runners"],
+                                                          runners),
+                                     "race": references(tables["races"],
+                                                        races),
+                                     "time": numpy.array(times, dtype=float)})
+        ids, runners, schools, years = read(Affiliations, ["runner", "school",
+                                                           "year"])
+        tables["affiliations"] = Columns({"id": numpy.array(ids, dtype=int),
+                                          "runner":
+                                          references(tables["runners"],
+                                                     runners),
+                                          "school":
+                                          references(tables["schools"],
+                                                     schools),
+                                          "year": integers(years)})
+        return cls(tables)
+
+    #Rows
+
+    def race(self, row):
+        """The Race in the given row of the races table."""
+        try:
+            return self._races[row]
+        except KeyError:
+            pass
+        races = self.races
+        meet = races["meet"][row]
+        meet = Meet(int(self.meets["id"][meet]), self.meets["name"][meet]) \
+                if meet >= 0 else None
+        venue = races["venue"][row]
+        venue = self.venue(venue) if venue >= 0 else None
+        race = Race(int(races["id"][row]), meet,
+                    date.fromordinal(races["date"][row]), venue,
+                    nullable(races["mens_distance"][row]),
+                    nullable(races["womens_distance"][row]))
+        self._races[row] = race
+        return race
+
+    def runner(self, row):
+        """The Runner in the given row of the runners table."""
+        runners = self.runners
+        return Runner(int(runners["id"][row]), runners["surname"][row],
+                      runners["given_name"][row],
+                      split_names(runners["nicknames"][row], str.strip),
+                      runners["gender"][row], nullable(runners["year"][row]))
+
+    def school(self, row):
+        """The School in the given row of the schools table."""
+        schools = self.schools
+        return School(int(schools["id"][row]), schools["name"][row],
+                      split_names(schools["nicknames"][row], str.lstrip),
+                      schools["type"][row], bool(schools["name_order"][row]),
+                      nullable(schools["conference"][row]))
+
+    def venue(self, row):
+        """The Venue in the given row of the venues table."""
+        venues = self.venues
+        return Venue(int(venues["id"][row]), venues["name"][row],
+                     venues["city"][row], venues["state"][row],
+                     nullable(venues["elevation"][row]))
+
+    #Lookups
+
+    def get_conference(self, label):
+        """Same as Conferences.get: find the conference with the given id,
+        name or abbreviation."""
+        conferences = self.conferences
+        try:
+            rows = self._rows_with_id(conferences, label)
+        except ValueError:
+            rows = numpy.flatnonzero((conferences["name"] == label) |
+                                     (conferences["abbreviation"] == label))
+        row = only(rows, label)
+        return Conference(int(conferences["id"][row]),
+                          conferences["name"][row],
+                          conferences["abbreviation"][row])
+
+    def get_distances(self, id_):
+        """Same as Distances.get."""
+        distances = self.distances
+        row = only(self._rows_with_id(distances, id_), id_)
+        return Distance(int(distances["id"][row]),
+                        nullable(distances["mens_distance"][row]),
+                        nullable(distances["womens_distance"][row]))
+
+    def get_race(self, label, year=date.today().year):
+        """Same as Races.get: find the race with the given id, or the race of
+        the meet with the given name run in the given year."""
+        races = self.races
+        try:
+            rows = self._rows_with_id(races, label)
+        except ValueError:
+            meet = only(numpy.flatnonzero(self.meets["name"] == label), label)
+            mask = races["meet"] == meet
+            mask &= races["date"] >= date(year, 1, 1).toordinal()
+            mask &= races["date"] <= date(year, 12, 31).toordinal()
+            rows = numpy.flatnonzero(mask)
+        return self.race(only(rows, label))
+
+    def get_runner(self, label, given_name=None, year=None):
+        """Same as Runners.get: find the runner with the given id, or with the
+        given surname, given name or nickname and year."""
+        runners = self.runners
+        try:
+            rows = self._rows_with_id(runners, label)
+        except ValueError:
+            mask = runners["surname"] == label
+            if year is not None:
+                mask &= runners["year"] == year
+            rows = [row for row in numpy.flatnonzero(mask)
+                    if given_name is None or
+                    given_name in self.runner(row).given_names]
+            label = "%s, %s (%s)" % (label, given_name, year)
+        return self.runner(only(rows, label))
+
+    def get_school(self, label):
+        """Same as Schools.get: find the school with the given id or name."""
+        schools = self.schools
+        try:
+            rows = self._rows_with_id(schools, label)
+        except ValueError:
+            rows = numpy.flatnonzero(schools["name"] == label)
+        return self.school(only(rows, label))
+
+    @staticmethod
+    def _rows_with_id(table, label):
+        """The rows of the table with the given id, as a list.  Raises a
+        ValueError if the label is not an id."""
+        row = table.row_of(int(label))
+        return [row] if row >= 0 else []
+
+    #Queries
+
+    def all_races(self):
+        """Every Race."""
+        return [self.race(row) for row in xrange(len(self.races))]
+
+    def catalog(self, seasons=None, since=None, limit=None, offset=0):
+        """Same as Races.catalog."""
+        dates = self.races["date"]
+        mask = numpy.ones(len(dates), dtype=bool)
+        if seasons is not None:
+            mask &= numpy.in1d([date.fromordinal(day).year for day in dates],
+                               list(seasons))
+        if since is not None:
+            mask &= dates >= since.toordinal()
+        races = [self.race(row) for row in numpy.flatnonzero(mask)]
+        #None, for races with no meet, sorts before any name
+        races.sort(key=lambda race: (race.date, race.meet and race.meet.name,
+                                     race.id))
+        end = offset + limit if limit is not None else None
+        for race in races[offset:end]:
+            venue = race.venue
+            yield CatalogEntry(race.id, race.meet and race.meet.name,
+                               race.date, race.mens_distance,
+                               race.womens_distance, venue and venue.name,
+                               venue and venue.city, venue and venue.state)
+
+    def all_runners(self):
+        """Every Runner."""
+        return [self.runner(row) for row in xrange(len(self.runners))]
+
+    def all_schools(self):
+        """Every School."""
+        return [self.school(row) for row in xrange(len(self.schools))]
+
+    def all_venues(self):
+        """Every Venue."""
+        return [self.venue(row) for row in xrange(len(self.venues))]
+
+    def conference_schools(self, conference):
+        """The Schools in the given conference."""
+        rows = numpy.flatnonzero(self.schools["conference"] == conference.id)
+        return [self.school(row) for row in rows]
+
+    def school_names(self):
+        """Same as Schools.names: generate every name and nickname of every
+        school."""
+        for school in self.all_schools():
+            for school_name in [school.name] + school.nicknames:
+                yield school_name
+
+    def schools_of(self, runner):
+        """Same as Runners.schools: the Schools the runner has been affiliated
+        with, mapped to the years of each affiliation."""
+        return self.affiliation_histories([runner]).get(runner.id,
+                                                        OrderedDict())
+
+    def affiliation_histories(self, runners=None):
+        """Same as Runners.affiliation_histories."""
+        affiliations = self.affiliations
+        mask = (affiliations["runner"] >= 0) & (affiliations["school"] >= 0)
+        if runners is not None:
+            runner_ids = [getattr(runner, "id", runner) for runner in runners]
+            rows = row_numbers(self.runners["id"], numpy.array(runner_ids,
+                                                               dtype=int))
+            mask &= numpy.in1d(affiliations["runner"], rows)
+        affiliations = affiliations.where(mask)
+        runner_ids = self.runners["id"][affiliations["runner"]]
+        #A stable sort keeps affiliations of the same year in table order
+        order = numpy.lexsort((affiliations["year"], runner_ids))
+        histories = {}
+        schools = {}
+        for runner_id, row, year in zip(runner_ids[order],
+                                        affiliations["school"][order],
+                                        affiliations["year"][order]):
+            if row not in schools:
+                schools[row] = self.school(row)
+            history = histories.setdefault(int(runner_id), OrderedDict())
+            history.setdefault(schools[row], []).append(int(year))
+        return histories
+
+    #Queries
+
+    def race_distances(self, gender):
+        """The distance of each race for the given gender."""
+        return self.races[{"M": "mens_distance",
+                           "F": "womens_distance"}[gender]]
+
+    def schools_in(self, year, schools=None):
+        """The row number of the school each runner was affiliated with in the
+        given year, or -1, considering only the given schools if any are
+        given."""
+        affiliations = self.affiliations
+        mask = affiliations["year"] == year
+        if schools is not None:
+            school_ids = [getattr(school, "id", school) for school in schools]
+            rows = row_numbers(self.schools["id"], numpy.array(school_ids,
+                                                               dtype=int))
+            mask &= numpy.in1d(affiliations["school"], rows)
+        found = numpy.zeros(len(self.runners), dtype=int) - 1
+        #Assigning in reverse keeps the first affiliation of each runner
+        runners = affiliations["runner"][mask][::-1]
+        found[runners] = affiliations["school"][mask][::-1]
+        return found
+
+    def _scaled_performances(self, gender, distance, schools, year,
+                             previous_years, strict):
+        """The performances considered by seasons_bests(), sorted by runner and
+        then by scaled time.  Returns the tuple (results, scaled times,
+        school rows by runner)."""
+        results = self.results
+        runner_schools = self.schools_in(year, schools)
+        runners = results["runner"]
+        race_distances = self.race_distances(gender)[results["race"]]
+        race_dates = self.races["date"][results["race"]]
+        mask = (runners >= 0) & (runner_schools[runners] >= 0)
+        mask &= self.runners["gender"][runners] == gender
+        if strict:
+            mask &= race_distances == distance
+        else:
+            mask &= race_distances >= distance
+        mask &= race_dates >= date(year - previous_years, 1, 1).toordinal()
+        mask &= race_dates <= date(year, 12, 31).toordinal()
+        results = results.where(mask)
+        scaled = results["time"] / race_distances[mask] * distance
+        order = numpy.lexsort((scaled, results["runner"]))
+        return results.where(order), scaled[order], runner_schools
+
+    def seasons_bests(self, gender, distance, schools, year, previous_years=0,
+                      strict=False):
+        """Same as Runners.seasons_bests."""
+        results, scaled, runner_schools = \
+                self._scaled_performances(gender, distance, schools, year,
+                                          previous_years, strict)
+        first = first_of_each(results["runner"])
+        bests = []
+        for row, race, time in zip(results["runner"][first],
+                                   results["race"][first], scaled[first]):
+            runner = self.runner(row)
+            bests.append(SeasonsBest(runner.id, runner.name, runner.year,
+                                     self.schools["name"][runner_schools[row]],
+                                     self.race(race), RaceTime(time)))
+        bests.sort(key=lambda best: best.time)
+        return bests
+
+    def performance_histories(self, gender, distance, schools, year,
+                              previous_years=0, strict=False):
+        """Same as Runners.performance_histories."""
+        results, scaled, runner_schools = \
+                self._scaled_performances(gender, distance, schools, year,
+                                          previous_years, strict)
+        runners = results["runner"]
+        starts = numpy.flatnonzero(first_of_each(runners))
+        ends = numpy.append(starts[1:], len(runners))
+        histories = []
+        for start, end in zip(starts, ends):
+            runner = self.runner(runners[start])
+            school = self.schools["name"][runner_schools[runners[start]]]
+            histories.append(PerformanceHistory(runner.id, runner.name,
+                                                runner.year, school,
+                                                scaled[start:end].tolist()))
+        return histories
+
+    def fastest(self, races, gender, year):
+        """Same as Results.fastest."""
+        results = self.results
+        race_rows = row_numbers(self.races["id"],
+                                numpy.array([race.id for race in races],
+                                            dtype=int))
+        mask = numpy.in1d(results["race"], race_rows)
+        mask &= self.runners["gender"][results["runner"]] == gender
+        results = results.where(mask)
+        pace = results["time"] / self.race_distances(gender)[results["race"]]
+        order = numpy.argsort(pace, kind="mergesort")
+        results = results.where(order)
+        runner_schools = self.schools_in(year)
+        seen = set()
+        fastest = []
+        for row, race, time in zip(results["runner"], results["race"],
+                                   results["time"]):
+            if row in seen:
+                continue
+            seen.add(row)
+            runner = self.runner(row)
+            school = runner_schools[row]
+            school = self.schools["name"][school] if school >= 0 else None
+            fastest.append(SeasonsBest(runner.id, runner.name, runner.year,
+                                       school, self.race(race),
+                                       RaceTime(time)))
+        return fastest
+
+    def results_of(self, runner_id):
+        """The Results run by the runner with the given id."""
+        row = self.runners.row_of(runner_id)
+        results = self.results.where(self.results["runner"] == row)
+        runner = self.runner(row)
+        return [Result(runner, self.race(race), RaceTime(time))
+                for race, time in zip(results["race"], results["time"])]
+
+    def team(self, school_id, year, gender=None):
+        """The Runners affiliated with the school with the given id in the
+        given year, sorted by name."""
+        affiliations = self.affiliations
+        school = self.schools.row_of(school_id)
+        mask = (affiliations["school"] == school) & \
+                (affiliations["year"] == year)
+        runners = [self.runner(row) for row in affiliations["runner"][mask]]
+        if gender is not None:
+            runners = [runner for runner in runners if runner.gender == gender]
+        return sorted(runners, key=lambda runner: (runner.surname,
+                                                   runner.given_name))
+
+    def rosters(self, schools, seasons, mens_distance, womens_distance,
+                strict=False):
+        """Same as Schools.rosters."""
+        affiliations = self.affiliations
+        school_ids = [school.id for school in schools]
+        school_rows = row_numbers(self.schools["id"],
+                                  numpy.array(school_ids, dtype=int))
+        mask = numpy.in1d(affiliations["school"], school_rows)
+        mask &= numpy.in1d(affiliations["year"], list(seasons))
+        mask &= affiliations["runner"] >= 0
+        affiliations = affiliations.where(mask)
+        bests = self._seasons_bests(affiliations["runner"], seasons,
+                                    mens_distance, womens_distance, strict)
+        by_row = dict(zip(school_rows, schools))
+        roster = {}
+        for school, season, row in zip(affiliations["school"],
+                                       affiliations["year"],
+                                       affiliations["runner"]):
+            key = school, int(season), row
+            if key not in roster:
+                roster[key] = RosterEntry(by_row[school], int(season),
+                                          self.runner(row),
+                                          bests.get((row, int(season))))
+        return sorted(roster.itervalues(),
+                      key=lambda entry: (school_ids.index(entry.school.id),
+                                         entry.season, entry.runner.surname,
+                                         entry.runner.given_name,
+                                         entry.runner.id))
+
+    def _seasons_bests(self, runners, seasons, mens_distance,
+                       womens_distance, strict):
+        """The best time of each of the runners in the given rows of the
+        runners table in each of the given seasons, scaled to the distance
+        for their gender.  Returns a dictionary from (row, season) to
+        RaceTime."""
+        results = self.results
+        mask = numpy.in1d(results["runner"], runners) & (results["race"] >= 0)
+        results = results.where(mask)
+        men = self.runners["gender"][results["runner"]] == "M"
+        races = results["race"]
+        distances = numpy.where(men, self.races["mens_distance"][races],
+                                self.races["womens_distance"][races])
+        distance = numpy.where(men, mens_distance, womens_distance)
+        if strict:
+            mask = distances == distance
+        else:
+            mask = distances >= distance
+        race_seasons = numpy.array([date.fromordinal(day).year for day
+                                    in self.races["date"][races]], dtype=int)
+        mask &= numpy.in1d(race_seasons, list(seasons))
+        scaled = results["time"][mask] / distances[mask] * distance[mask]
+        bests = {}
+        for row, season, time in zip(results["runner"][mask],
+                                     race_seasons[mask], scaled):
+            key = row, int(season)
+            if key not in bests or time < bests[key]:
+                bests[key] = time
+        return dict((key, RaceTime(time)) for key, time in bests.iteritems())
+
+def integers(values):
+    """An array of integers, with None stored as -1."""
+    return numpy.array([-1 if value is None else value for value in values],
+                       dtype=int)
+
+def encode(value):
+    """Encode a value from the database as a UTF-8 string, with None stored
+    as the empty string."""
+    if value is None:
+        return ""
+    if isinstance(value, unicode):
+        return value.encode("utf-8")
+    return value
+
+def nullable(value):
+    """Convert a value stored by integers() back to an int or None."""
+    return None if value == -1 else int(value)
+
+def only(rows, label):
+    """The only row number in rows.  Raises SQLObjectNotFound if there are
+    none, and TooManyObjectsError if there are more than one."""
+    if len(rows) == 0:
+        raise SQLObjectNotFound("Could not find \"%s\"." % label)
+    if len(rows) > 1:
+        raise TooManyObjectsError("More than one \"%s\" found." % label)
+    return rows[0]
+
+def references(table, ids):
+    """An array of row numbers in the given table for the given ids."""
+    return row_numbers(table["id"], integers(ids))
+
+def strings(values):
+    """An array of UTF-8 encoded strings, with None stored as the empty
+    string."""
+    return numpy.array(map(encode, values), dtype=str)
+
+def split_names(names, strip):
+    """Split a comma-separated list of names, as stored in the nicknames
+    columns, stripping each name with the given function."""
+    if names == "":
+        return []
+    return [strip(name) for name in names.split(",")]
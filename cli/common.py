@@ -1,19 +1,33 @@
 """A library of useful functions to help the scripts in this directory.  This
 includes shorthand methods of querying the database."""
 
+from formatting import Table
+import hytek
 from hytek import DefaultTable, ResultsDumper
 from optparse import OptionParser as BuiltinOptionParser
 from os import environ as environment
 from sqlobject import connectionForURI, sqlhub, SQLObjectNotFound
 from sqlobject.dberrors import OperationalError
 from sqlobject.main import SQLObjectNotFound
+from sys import stdout
 from xcanalyze.models import Distances, Schools, TooManyObjectsError
+from xcanalyze.output import WRITERS
+from xcanalyze.session import Session
 
 CNX_ENV_VAR = "XCA_CNX"
 
+#The URIs of the databases that have been connected to and checked
+_checked = set()
+#The tables loaded into memory from each database, by URI
+_stores = {}
+
 def connect(uri):
-    """Create a connection to the database at the specified URI.  Raises
-    ConnectionError if any problems are encountered."""
+    """Create a connection to the database at the specified URI.  SQLObject
+    keeps a single connection, with its pool of open database connections,
+    for each URI, and the database is checked only the first time it is
+    connected to, so connecting again in the same process, as each command
+    run by batch.py does, costs nothing.  Raises ConnectionError if any
+    problems are encountered."""
     try:
         sqlhub.processConnection = connectionForURI(uri)
     except KeyError:
@@ -22,13 +36,19 @@ def connect(uri):
         requested_driver = uri.split(":")[0]
         raise ConnectionError("No database driver exists for " +
                               requested_driver)
-    #Check that communication with the given database is possible
+    if uri in _checked:
+        return
+    #Check that communication with the given database is possible.  The check
+    #is made here rather than at the first query, because every script calls
+    #connect where it reports a ConnectionError as a usage error, and the
+    #first query is often made where a failure would end in a traceback.
     try:
         Distances.get(1)
     except OperationalError, error:
         raise ConnectionError(error)
     except SQLObjectNotFound:
         pass
+    _checked.add(uri)
 
 def default_server():
     """Get the default server defined in the environment variable XCA_CNX."""
@@ -67,10 +87,13 @@ class OptionParser(BuiltinOptionParser):
                         help="URI for the SQL server")
 
     @staticmethod
-    def parse_schools(string):
+    def parse_schools(string, store=None):
         """Parse a comma-separated list of numbers and integers into a list of
-        School instances."""
-        schools = set(school for school in Schools.select())
+        School instances, or of rows of the store if one is given."""
+        select, get = Schools.select, Schools.get
+        if store is not None:
+            select, get = store.all_schools, store.get_school
+        schools = set(school for school in select())
         try:
             string = string.lstrip()
         except AttributeError:
@@ -80,7 +103,7 @@ class OptionParser(BuiltinOptionParser):
             for label in string[3:].split(","):
                 label = label.strip()
                 try:
-                    avoid.update(Schools.get(label))
+                    avoid.add(get(label))
                 except TooManyObjectsError:
                     pass
                 except SQLObjectNotFound:
@@ -91,7 +114,7 @@ class OptionParser(BuiltinOptionParser):
             for label in string.split(","):
                 label = label.strip()
                 try:
-                    include.append(Schools.get(label))
+                    include.append(get(label))
                 except TooManyObjectsError:
                     pass
                 except SQLObjectNotFound:
@@ -120,6 +143,65 @@ class GenderedOptionParser(OptionParser):
             usage = usage.replace("%prog", "%prog GENDER")
         OptionParser.set_usage(self, usage)
 
+def open_data_source(options):
+    """Open the snapshot named by the options, or else connect to the
+    database, loading the tables into memory if the options request it.  The
+    tables are loaded only once for each database in a process.  Returns a
+    ColumnStore, or None if the database should be queried directly.  Raises
+    ConnectionError if any problems are encountered."""
+    #ColumnStore needs NumPy, so it is imported only when it is used
+    if options.snapshot is not None:
+        from xcanalyze.columns import ColumnStore
+        from xcanalyze.snapshot import SnapshotError
+        try:
+            return ColumnStore.open(options.snapshot)
+        except (EnvironmentError, SnapshotError), error:
+            raise ConnectionError(error)
+    connect(options.server)
+    if options.in_memory:
+        from xcanalyze.columns import ColumnStore
+        if options.server not in _stores:
+            _stores[options.server] = ColumnStore.load()
+        return _stores[options.server]
+    return None
+
+def data_source_options(option_parser):
+    """Add options to the option parser that choose where data is read
+    from."""
+    option_parser.add_option("--in-memory", action="store_true",
+                             default=False, help="Load the tables into "
+                             "memory once and answer queries from there.")
+    option_parser.add_option("--snapshot", help="Read the tables from a "
+                             "snapshot written by make_snapshot.py instead of "
+                             "the database.", metavar="FILE")
+    return option_parser
+
+def output_options(option_parser):
+    """Add options to the option parser that choose how tables are printed
+    by print_table."""
+    option_parser.add_option("--format", choices=sorted(WRITERS),
+                             default="table", help="Print a table (the "
+                             "default), or csv, tsv or json-lines, which are "
+                             "printed row by row.")
+    option_parser.add_option("--stream", action="store_true", default=False,
+                             help="Print each row of the table as soon as it "
+                             "is found, with columns of fixed width instead "
+                             "of columns sized to fit every row.")
+    return option_parser
+
+def print_table(rows, options, headings, widths=None, pads=None):
+    """Print the rows in the format chosen by the options added by
+    output_options.  The headings name the columns in the csv, tsv and
+    json-lines formats, and the widths are those of the columns when a table
+    is streamed.  A table that is not streamed is printed with
+    formatting.Table, which must read every row first."""
+    if options.format == "table" and not options.stream:
+        kwargs = {"pads": pads} if pads is not None else {}
+        for row in Table(rows, column_seperator=" | ", **kwargs):
+            print row
+    else:
+        WRITERS[options.format](rows, stdout, headings, widths, pads)
+
 def race_display_options(option_parser):
     """Add options to the option parser that manipulate the display of race
     information."""
@@ -131,16 +213,28 @@ def race_display_options(option_parser):
                              "runners in the results.")
     return option_parser
 
+class Finisher(hytek.Finisher):
+    """A hytek.Finisher that also records the number of the race the time was
+    run in, for use by SeasonsBestDumper."""
+    def __init__(self, name, time, year, school, race_num):
+        super(Finisher, self).__init__(name, time, year, school)
+        self.race_num = race_num
+
 class RaceDumper(DefaultTable):
-    """Dump race results in a HyTek-style format."""
+    """Dump race results in a HyTek-style format.  The races are numbered by
+    their position in the list given, so the race_num of each Finisher must
+    be the position of its race in that same list, as AggregatedResults.races
+    is for the results of show_race and predict."""
     def __init__(self, races, gender):
         headings = ["", "Race name", "Date", "Location", "", "", "Distance"]
         pads = [str.rjust, None, None, None, None, None, None]
-        for i, race in enumerate(races):
-            race.num = i
-            rows = [[race.num, race.meet.name[:20], race.date,
-                     race.venue.name[:20], race.venue.city, race.venue.state,
-                     int(race.distance(gender))] for race in races]
+        #The meets and venues are loaded with one query each, so that every
+        #row is built in a single pass without touching the database
+        races = Session().prefetch(races, "meet", "venue")
+        rows = [[i, race.meet.name[:20], race.date, race.venue.name[:20],
+                 race.venue.city, race.venue.state,
+                 int(race.distance(gender))]
+                for i, race in enumerate(races)]
         super(RaceDumper, self).__init__(rows, headings=headings, pads=pads)
 
 class SeasonsBestDumper(ResultsDumper):
@@ -0,0 +1,151 @@
+#!/usr/bin/python
+
+"""Check that the queries the scripts in this directory make are answered
+from indexes.  Representative lookups are run against the database, the SQL
+they issue is captured and each SELECT is explained.  Prints the tables each
+lookup reads in full; exits with status 1 if any lookup does a full scan.
+Run migrate.py to create the indexes."""
+
+from formatting import Table
+from miscellaneous import main_function
+import re
+from xcanalyze.models import Affiliations, Distances, Races, Results, Runners
+from xcanalyze.models import Schools, season_range, SeasonsBests
+
+from common import connect, ConnectionError, OptionParser
+
+#A step of an SQLite query plan that reads every row of a table, and the
+#clause of such a step that says it reads them through an index
+SQLITE_SCAN = re.compile(r"^SCAN (?:TABLE )?(\S+)(.*)$")
+SQLITE_USING_INDEX = re.compile(r"\bUSING\b.*\bINDEX\b")
+
+def parse_arguments(arguments):
+    """Parse command line arguments.  Returns the tuple (options,
+    arguments)."""
+    option_parser = OptionParser()
+    option_parser.add_option("-v", "--verbose", action="store_true",
+                             default=False, help="Print each query and its "
+                             "plan.")
+    options, arguments = option_parser.parse_args(arguments[1:])
+    if options.server is None:
+        option_parser.error(OptionParser.NO_SERVER_MESSAGE)
+    try:
+        connect(options.server)
+    except ConnectionError, error:
+        option_parser.error(error)
+    if Runners._connection.dbName not in EXPLAINERS:
+        option_parser.error("Cannot explain queries on %s databases." %
+                            Runners._connection.dbName)
+    return options, arguments
+
+@main_function(parse_arguments)
+def main(options, arguments):
+    """Explain the queries of each lookup and print the tables scanned."""
+    connection = Runners._connection
+    explain = EXPLAINERS[connection.dbName]
+    lookups = sample_lookups()
+    if lookups is None:
+        print "The database has no affiliations to look up."
+        return 1
+    rows = []
+    for name, lookup in lookups:
+        scanned = set()
+        for statement in capture(connection, lookup):
+            plan, scans = explain(connection, statement)
+            scanned.update(scans)
+            if options.verbose:
+                print statement
+                for line in plan:
+                    print "    " + line
+        rows.append([name, ", ".join(sorted(scanned)) or None])
+    for row in Table([["Lookup", "Full scans"]] + rows,
+                     column_seperator=" | "):
+        print row
+    if any(scanned is not None for name, scanned in rows):
+        return 1
+
+def capture(connection, function):
+    """Call the function, returning the distinct SELECT statements it sends
+    to the connection in the order they were first sent."""
+    statements = []
+    def print_debug(conn, s, name, type="query"):
+        if name == "QueryR" and s.lstrip().upper().startswith("SELECT") and \
+                s not in statements:
+            statements.append(s)
+    connection.printDebug = print_debug
+    connection.debug = True
+    try:
+        function()
+    finally:
+        connection.debug = False
+        del connection.printDebug
+    return statements
+
+def explain_mysql(connection, statement):
+    """Explain a statement on MySQL.  Returns the tuple (plan, scanned), where
+    plan is a list of lines and scanned the list of tables read in full."""
+    description, rows = connection.queryAllDescription("EXPLAIN " + statement)
+    columns = [column[0] for column in description]
+    table, access = columns.index("table"), columns.index("type")
+    plan = [" ".join(str(value) for value in row) for row in rows]
+    return plan, [row[table] for row in rows if row[access] == "ALL"]
+
+def explain_sqlite(connection, statement):
+    """Explain a statement on SQLite.  Returns the tuple (plan, scanned), where
+    plan is a list of lines and scanned the list of tables read in full.  A
+    scan of a table through one of its indexes, such as SCAN results USING
+    COVERING INDEX results_runner, reads the index rather than the table,
+    and is not counted."""
+    plan = [row[-1] for row in
+            connection.queryAll("EXPLAIN QUERY PLAN " + statement)]
+    scanned = []
+    for detail in plan:
+        scan = SQLITE_SCAN.match(detail)
+        if scan is not None and scan.group(1) != "CONSTANT" and \
+                SQLITE_USING_INDEX.search(scan.group(2)) is None:
+            scanned.append(scan.group(1))
+    return plan, scanned
+
+EXPLAINERS = {"mysql": explain_mysql, "sqlite": explain_sqlite}
+
+def sample_lookups():
+    """The lookups to explain, a list of (name, function) pairs, made with
+    the most recent affiliation and race in the database.  Returns None if
+    there are no affiliations."""
+    affiliations = list(Affiliations.select(orderBy="-year")[:1])
+    races = list(Races.select(orderBy="-date")[:1])
+    if len(affiliations) == 0 or len(races) == 0:
+        return None
+    runner, school, year = affiliations[0].runner, affiliations[0].school, \
+            affiliations[0].year
+    race = races[0]
+    #Check for the seasons_bests table now, so its probe is not counted
+    SeasonsBests.available()
+    gender = runner.gender
+    distances = Distances.get(1)
+    distance = distances.mens_distance if gender == "M" else \
+            distances.womens_distance
+    return [("Results of a runner",
+             lambda: list(Results.selectBy(runner=runner))),
+            ("Results of a race", lambda: list(Results.selectBy(race=race))),
+            ("Schools of a runner", runner.schools),
+            ("School of a runner in a season", lambda: runner.school(year)),
+            ("Performances of a runner in a season",
+             lambda: list(runner.performances(distance, year))),
+            ("Team of a school", lambda: school.team(year, gender)),
+            ("Roster of a school with season's bests",
+             lambda: Schools.rosters([school], [year],
+                                     distances.mens_distance,
+                                     distances.womens_distance)),
+            ("Races of a season",
+             lambda: list(Races.select(season_range([year])))),
+            ("Fastest results of a race",
+             lambda: Results.fastest([race], gender, year)),
+            ("Best performance of a runner in a season",
+             lambda: Runners.best_performances([runner], distance, [year])),
+            ("Season's bests of a team",
+             lambda: Runners.seasons_bests(gender, distance, [school.id],
+                                           year))]
+
+if __name__ == "__main__":
+    main()
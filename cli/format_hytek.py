@@ -1,27 +1,37 @@
 #!/usr/bin/python
 
 """Format a results sheet produced by the Hy-tek Meet Manager into the easier
-to parse YAML format."""
+to parse YAML format.  Each finisher is written as soon as it is read, so
+sheets of any size are converted in constant memory."""
 
-from hytek import load, LoadError
+from hytek import LoadError
 from miscellaneous import main_function
-from sys import stderr, stdin
-from yaml import dump
+from optparse import OptionParser
+from sys import stderr, stdin, stdout
+from xcanalyze.records import WRITERS
+from xcanalyze.sheets import irecords
 
-@main_function()
+def parse_arguments(arguments):
+    """Parse command line arguments.  Returns the tuple (options,
+    arguments)."""
+    option_parser = OptionParser()
+    option_parser.add_option("-f", "--format", choices=sorted(WRITERS),
+                             default="yaml", help="Output format: yaml (the "
+                             "default) or json-lines.")
+    return option_parser.parse_args(arguments[1:])
+
+@main_function(parse_arguments)
 def main(options, arguments):
-    """Read a file on stdin and dump a yaml file to stdout."""
+    """Read a file on stdin and dump each finisher to stdout."""
+    write = WRITERS[options.format]
     try:
-        results = load(stdin.read())
+        for record in irecords(stdin):
+            write(record, stdout)
     except KeyboardInterrupt:
         return 1
     except LoadError, error:
         print >> stderr, error
         return 1
-    results = [{"name": runner.name, "school": runner.team, "time":
-                runner.time.seconds + runner.time.microseconds / 1000000.0} for
-               runner in results]
-    print dump(results)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,192 @@
+#!/usr/bin/python
+
+"""Import a season's worth of Hy-tek results sheets in one run.  The sheets
+are listed in a YAML manifest, a list with one entry for each race, such as
+
+    - file: aztec.txt
+      meet: Aztec Invitational
+      date: 2008-09-13
+      venue: Balboa Park, San Diego, CA
+      mens_distance: 8000
+      comments: Hot and dry.
+
+where the venue is either a known venue or "NAME, CITY, STATE", and the
+distances default to those of the distances table.  The sheets are parsed in
+a pool of processes while the races are saved, each in its own transaction.
+Results whose runner cannot be identified are reported and skipped."""
+
+from datetime import date
+from formatting import Table
+from hytek import LoadError
+from itertools import imap, izip
+from miscellaneous import main_function
+from multiprocessing import cpu_count, Pool
+from os.path import join
+from sqlobject import sqlhub, SQLObjectNotFound
+from sys import stderr
+from time import time
+from xcanalyze.models import Distances, Races, TooManyObjectsError, Venues
+from xcanalyze.names import NameIndex
+from xcanalyze.sheets import irecords
+from yaml import safe_load
+from yaml.error import YAMLError
+
+from common import connect, ConnectionError, OptionParser
+
+MANIFEST = "manifest.yaml"
+REQUIRED_KEYS = frozenset(["date", "file", "meet", "venue"])
+
+def parse_arguments(arguments):
+    """Parse command line arguments.  Returns the tuple (options,
+    (directory, races)), where races is the list of manifest entries."""
+    option_parser = OptionParser("%prog [options] DIRECTORY [MANIFEST]")
+    option_parser.add_option("-p", "--processes", help="Number of processes "
+                             "to parse sheets in.  Defaults to one per CPU.",
+                             type="int")
+    options, arguments = option_parser.parse_args(arguments[1:])
+    if len(arguments) not in (1, 2):
+        option_parser.error("Please specify the directory of results sheets.")
+    directory = arguments[0]
+    manifest = arguments[1] if len(arguments) == 2 else join(directory,
+                                                             MANIFEST)
+    try:
+        with open(manifest) as stream:
+            races = safe_load(stream)
+    except (EnvironmentError, YAMLError), error:
+        option_parser.error(error)
+    if not isinstance(races, list):
+        option_parser.error("%s should be a list of races." % manifest)
+    for race in races:
+        if not isinstance(race, dict) or not REQUIRED_KEYS <= set(race):
+            option_parser.error("Each race in %s needs a %s." %
+                                (manifest, ", ".join(sorted(REQUIRED_KEYS))))
+        if not isinstance(race["date"], date):
+            option_parser.error("%s: %s is not a date of the form "
+                                "YYYY-MM-DD." % (race["file"], race["date"]))
+    try:
+        connect(options.server)
+    except ConnectionError, error:
+        option_parser.error(error)
+    if options.processes is None:
+        options.processes = cpu_count()
+    return options, (directory, races)
+
+@main_function(parse_arguments)
+def main(options, (directory, races)):
+    """Parse, resolve and save each race in the manifest, then print the time
+    spent on each file."""
+    distances = Distances.get(1)
+    indexes = {}
+    paths = [join(directory, race["file"]) for race in races]
+    if options.processes > 1 and len(paths) > 1:
+        pool = Pool(options.processes)
+        parsed = pool.imap(parse_sheet, paths)
+    else:
+        pool = None
+        parsed = imap(parse_sheet, paths)
+    rows = []
+    try:
+        for race, (results, parse_time, error) in izip(races, parsed):
+            if error is not None:
+                print >> stderr, "%s: %s" % (race["file"], error)
+                rows.append([race["file"], None, None, parse_time, None,
+                             None])
+                continue
+            started = time()
+            year = race["date"].year
+            if year not in indexes:
+                indexes[year] = NameIndex(year)
+            unresolved = resolve(indexes[year], results, race["file"])
+            resolve_time = time() - started
+            started = time()
+            try:
+                sqlhub.doInTransaction(save_race, race, distances, results)
+            except (SQLObjectNotFound, TooManyObjectsError), error:
+                print >> stderr, "%s: %s" % (race["file"], error)
+                rows.append([race["file"], len(results), unresolved,
+                             parse_time, resolve_time, None])
+                continue
+            save_time = time() - started
+            rows.append([race["file"], len(results), unresolved, parse_time,
+                         resolve_time, save_time])
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    for row in timing_table(rows):
+        print row
+
+def save_race(race, distances, results):
+    """Save a race of the manifest and its results, creating its venue if need
+    be.  Run in a transaction, so that a race that cannot be saved leaves no
+    new venue behind."""
+    return Races.create_with_results(race["meet"], race["date"],
+                                     find_venue(race["venue"]),
+                                     race.get("mens_distance",
+                                              distances.mens_distance),
+                                     race.get("womens_distance",
+                                              distances.womens_distance),
+                                     race.get("comments"), results)
+
+def find_venue(label):
+    """Find the venue with the given name or id, creating a new venue if the
+    label is of the form "NAME, CITY, STATE" and no such venue exists.  Raises
+    SQLObjectNotFound if there is no such venue to find or create, and
+    TooManyObjectsError if the name is shared by more than one venue."""
+    try:
+        return Venues.get(label)
+    except SQLObjectNotFound:
+        try:
+            name, city, state = str(label).split(", ")
+        except ValueError:
+            raise SQLObjectNotFound("Could not find venue \"%s\"." % label)
+        found = list(Venues.selectBy(name=name, city=city, state=state))
+        if len(found) > 0:
+            return found[0]
+        return Venues(name=name, city=city, state=state, elevation=None)
+
+def parse_sheet(path):
+    """Parse the results sheet at the given path.  Returns the tuple (results,
+    seconds taken, error message), where the error message is None unless the
+    sheet could not be read."""
+    started = time()
+    try:
+        with open(path) as sheet:
+            results = list(irecords(sheet))
+    except (EnvironmentError, LoadError), error:
+        return None, time() - started, str(error)
+    return results, time() - started, None
+
+def resolve(index, results, name):
+    """Replace the runner names in the results with their ID numbers, removing
+    and reporting the results whose runner cannot be identified.  Returns the
+    number of results removed."""
+    resolved = []
+    for result in results:
+        errors = index.resolve(result)
+        for error in errors:
+            print >> stderr, "%s: %s" % (name, error)
+        if "runner_id" in result:
+            resolved.append(result)
+        elif len(errors) == 0:
+            print >> stderr, "%s: No runner \"%s\" found." % (name,
+                                                            result["name"])
+    unresolved = len(results) - len(resolved)
+    results[:] = resolved
+    return unresolved
+
+def timing_table(rows):
+    """Construct the table of the time spent on each file, with a row of
+    totals."""
+    headings = ["File", "Results", "Unresolved", "Parse", "Resolve", "Save"]
+    totals = ["Total"] + [sum(row[i] for row in rows if row[i] is not None)
+                          for i in xrange(1, len(headings))]
+    def format_row(row):
+        return row[:3] + [None if seconds is None else "%.3f" % seconds
+                          for seconds in row[3:]]
+    pads = [None] + [str.rjust] * (len(headings) - 1)
+    return Table([headings] + map(format_row, rows + [totals]),
+                 column_seperator=" | ", pads=pads)
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,19 @@
 #!/usr/bin/python
 
 """Retrieves the races available from the database and shows their names or
-other attributes as specified. """
+other attributes as specified.  The races are read in a single query, sorted
+by date and meet, and printed as they are read."""
 
-from formatting import Table
+from datetime import datetime
 from miscellaneous import main_function
 from xcanalyze.models import Races
 
-from common import connect, ConnectionError, OptionParser
+from common import ConnectionError, data_source_options, \
+        open_data_source, OptionParser, output_options, print_table
+
+HEADINGS = ["id", "meet", "date", "mens_distance", "womens_distance",
+            "venue", "city", "state"]
+WIDTHS = [5, 30, 10, 5, 5, 30, 20]
 
 def parse_arguments(arguments):
     """Parse the command-line arguments.  Returns the tuple (options,
@@ -16,45 +22,50 @@ def parse_arguments(arguments):
     option_parser.add_option("--show-venues", action="store_true",
                              default=False, help="Show the venue where each "
                              "race was held.")
+    option_parser.add_option("--season", action="append", dest="seasons",
+                             help="Show only the races of the given season.  "
+                             "May be given more than once.", metavar="YEAR",
+                             type="int")
+    option_parser.add_option("--since", help="Show only the races run on or "
+                             "after the given date.", metavar="YYYY-MM-DD")
+    option_parser.add_option("--limit", help="Show at most the given number "
+                             "of races.", type="int")
+    option_parser.add_option("--offset", default=0, help="Skip the given "
+                             "number of races.", type="int")
+    data_source_options(option_parser)
+    output_options(option_parser)
     options, arguments = option_parser.parse_args(arguments[1:])
+    if options.since is not None:
+        try:
+            options.since = datetime.strptime(options.since, "%Y-%m-%d").date()
+        except ValueError:
+            option_parser.error("%s is not a date of the form YYYY-MM-DD." %
+                                options.since)
+    if options.limit is not None and options.limit < 0 or options.offset < 0:
+        option_parser.error("The limit and offset may not be negative.")
     try:
-        connect(options.server)
+        options.store = open_data_source(options)
     except ConnectionError, error:
         option_parser.error(error)
     return options, arguments
 
 @main_function(parse_arguments)
 def main(options, arguments):
-    print options.show_venues
-    def key(race):
-        try:
-            return (race.date, race.meet.name)
-        except AttributeError:
-            return (race.date,)
-    races = sorted(Races.select(), key=key)
-    rows = irows(races, options.show_venues)
-    for row in Table(rows, column_seperator=" | "):
-        print row
+    source = Races if options.store is None else options.store
+    races = source.catalog(options.seasons, options.since, options.limit,
+                           options.offset)
+    columns = len(HEADINGS) if options.show_venues else 5
+    print_table(irows(races, options.show_venues), options,
+                HEADINGS[:columns], WIDTHS[:columns])
 
 def irows(races, show_venues):
-    """Generate all the rows of the output table."""
+    """Generate all the rows of the output table from the entries of the race
+    catalog."""
     for race in races:
-        try:
-            mens_distance = int(race.mens_distance)
-        except TypeError:
-            mens_distance = None
-        try:
-            womens_distance = int(race.womens_distance)
-        except TypeError:
-            womens_distance = None
-        name = race.meet.name if race.meet is not None else None
-        row = [race.id, name, race.date, mens_distance,
-                     womens_distance]
+        row = [race.id, race.meet, race.date, race.mens_distance,
+               race.womens_distance]
         if show_venues:
-            if race.venue is not None:
-                row += [race.venue.name, race.venue.city, race.venue.state]
-            else:
-                row += [None] * 3
+            row += [race.venue, race.city, race.state]
         yield row
 
 if __name__ == "__main__":
@@ -2,38 +2,49 @@
 
 """List all runners in the database."""
 
-from formatting import Table
 from miscellaneous import main_function
 from xcanalyze.models import Runners
 
-from common import connect, ConnectionError, OptionParser
+from common import ConnectionError, data_source_options, \
+        open_data_source, OptionParser, output_options, print_table
+
+HEADINGS = ["id", "name", "gender", "schools"]
+WIDTHS = [5, 30, 1]
 
 def parse_arguments(arguments):
     """Parse command line arguments.  Returns the tuple (options,
     arguments)."""
     option_parser = OptionParser()
+    data_source_options(option_parser)
+    output_options(option_parser)
     options, arguments = option_parser.parse_args(arguments[1:])
     try:
-        connect(options.server)
+        options.store = open_data_source(options)
     except ConnectionError, error:
         option_parser.error(error)
     return options, arguments
 
 @main_function(parse_arguments)
 def main(options, arguments):
-    runners = irows(Runners.select())
-    for runner in Table(runners, column_seperator=" | "):
-        print runner
-
-def irows(runners):
-    """Construct the rows of the table."""
+    if options.store is not None:
+        runners = options.store.all_runners()
+        histories = options.store.affiliation_histories()
+    else:
+        runners = Runners.select()
+        histories = Runners.affiliation_histories()
+    print_table(irows(runners, histories), options, HEADINGS, WIDTHS)
+
+def irows(runners, histories):
+    """Construct the rows of the table, taking the schools of each runner
+    from the given affiliation histories."""
     for runner in runners:
         yield [runner.id, runner.name, runner.gender,
-               "; ".join(ischools(runner))]
+               "; ".join(ischools(histories.get(runner.id, {})))]
 
-def ischools(runner):
-    """Construct the school cell of the table."""
-    for school, years in runner.schools().iteritems():
+def ischools(schools):
+    """Construct the school cell of the table from the schools of a runner,
+    mapped to the years of each affiliation."""
+    for school, years in schools.iteritems():
         years = (str(year) for year in years)
         yield school.name + " (" + ", ".join(years) + ")"
 
@@ -5,7 +5,8 @@
 from miscellaneous import main_function
 from xcanalyze.models import Schools
 
-from common import connect, ConnectionError, OptionParser
+from common import ConnectionError, data_source_options, \
+        open_data_source, OptionParser
 
 def parse_arguments(arguments):
     """Parse command line arguments.  Returns the tuple (options, arguments)."""
@@ -14,20 +15,25 @@ def parse_arguments(arguments):
                              default=False, help="Print database ID and "
                              "official name.  If not set, the program prints "
                              "out a list of all nicknames as well.")
+    data_source_options(option_parser)
     options, arguments = option_parser.parse_args(arguments[1:])
     try:
-        connect(options.server)
+        options.store = open_data_source(options)
     except ConnectionError, error:
         option_parser.error(error)
     return options, arguments
 
 @main_function(parse_arguments)
 def main(options, arguments):
+    if options.store is not None:
+        select, names = options.store.all_schools, options.store.school_names
+    else:
+        select, names = Schools.select, Schools.names
     if options.pretty:
-        for school in Schools.select():
+        for school in select():
             print school.id, school.full_name
     else:
-        for school in Schools.names():
+        for school in names():
             print school
 
 if __name__ == "__main__":
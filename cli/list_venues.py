@@ -2,27 +2,34 @@
 
 """List all the venues in the database."""
 
-import formatting
 from miscellaneous import main_function
 from xcanalyze.models import Venues
 
-from common import connect, ConnectionError, OptionParser
+from common import ConnectionError, data_source_options, \
+        open_data_source, OptionParser, output_options, print_table
+
+HEADINGS = ["name", "city", "state", "elevation"]
+WIDTHS = [35, 20, 2]
 
 def parse_arguments(arguments):
     """Parse command-line arguments."""
     option_parser = OptionParser()
+    data_source_options(option_parser)
+    output_options(option_parser)
     options, arguments = option_parser.parse_args(arguments[1:])
     try:
-        connect(options.server)
+        options.store = open_data_source(options)
     except ConnectionError, error:
         option_parser.error(error)
     return options, arguments
 
 @main_function(parse_arguments)
 def main(options, arguments):
-    venues = ivenues(Venues.select())
-    for row in formatting.Table(venues, column_seperator=" | "):
-        print row
+    if options.store is not None:
+        venues = ivenues(options.store.all_venues())
+    else:
+        venues = ivenues(Venues.select())
+    print_table(venues, options, HEADINGS, WIDTHS)
 
 def ivenues(venues):
     """Generate rows for the output table."""
@@ -0,0 +1,29 @@
+#!/usr/bin/python
+
+"""Write a snapshot of the database to a file, which the list_*, show_* and
+predict scripts can read with the --snapshot flag instead of connecting to
+the database."""
+
+from miscellaneous import main_function
+from xcanalyze.columns import ColumnStore
+
+from common import connect, ConnectionError, OptionParser
+
+def parse_arguments(arguments):
+    """Parse command-line arguments.  Returns the tuple (options, (path,))."""
+    option_parser = OptionParser("%prog FILE")
+    options, arguments = option_parser.parse_args(arguments[1:])
+    if len(arguments) != 1:
+        option_parser.error("Please specify the file to write.")
+    try:
+        connect(options.server)
+    except ConnectionError, error:
+        option_parser.error(error)
+    return options, (arguments[0],)
+
+@main_function(parse_arguments)
+def main(options, (path,)):
+    ColumnStore.load().save(path)
+
+if __name__ == "__main__":
+    main()
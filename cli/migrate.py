@@ -0,0 +1,44 @@
+#!/usr/bin/python
+
+"""Bring the schema of a database up to date by applying the migrations in
+migrations.py that it has not had yet."""
+
+from miscellaneous import main_function
+from xcanalyze.migrations import applied, migrate, MIGRATIONS
+
+from common import connect, ConnectionError, OptionParser
+
+def parse_arguments(arguments):
+    """Parse command line arguments.  Returns the tuple (options,
+    arguments)."""
+    option_parser = OptionParser()
+    option_parser.add_option("-l", "--list", action="store_true",
+                             default=False, help="List the migrations and "
+                             "whether each has been applied, without applying "
+                             "any.")
+    options, arguments = option_parser.parse_args(arguments[1:])
+    if options.server is None:
+        option_parser.error(OptionParser.NO_SERVER_MESSAGE)
+    try:
+        connect(options.server)
+    except ConnectionError, error:
+        option_parser.error(error)
+    return options, arguments
+
+@main_function(parse_arguments)
+def main(options, arguments):
+    """Apply the pending migrations, or list them all."""
+    if options.list:
+        done = applied()
+        for number, description, steps in MIGRATIONS:
+            status = "applied" if number in done else "pending"
+            print "%d (%s): %s" % (number, status, description)
+        return
+    migrations = migrate()
+    if len(migrations) == 0:
+        print "The database is up to date."
+    for number, description, steps in migrations:
+        print "Applied %d: %s" % (number, description)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Versioned changes to the schema of the database.  Each migration is a
+number, a description and a list of steps, each either an SQL statement or a
+function to call with no arguments.  The migrations that have been applied to
+a database are recorded in its schema_migrations table, so each is run only
+once.  New migrations must be appended to MIGRATIONS with the next number."""
+
+from sqlobject import sqlhub
+
+from models import insert_many, SchemaMigrations, SeasonsBests, TableVersions
+
+def seed_table_versions():
+    """Give every table whose version is kept a row in table_versions, at
+    version 1 rather than the 0 of a table with no row."""
+    present = set(row.table_name for row in TableVersions.select())
+    insert_many(TableVersions, [{"table_name": table, "version": 1}
+                                for table in sorted(TableVersions.tracked)
+                                if table not in present])
+
+MIGRATIONS = [
+    (1, "Index results by runner and by race, affiliations by runner and by "
+     "school, and races by date.",
+     #Each index covers the columns the queries of models.py read, so the
+     #matching rows need not be looked up in the table itself.
+     ["CREATE INDEX results_runner ON results (runner_id, race_id, time)",
+      "CREATE INDEX results_race ON results (race_id, runner_id, time)",
+      "CREATE INDEX affiliations_runner ON affiliations "
+      "(runner_id, year, school_id)",
+      "CREATE INDEX affiliations_school ON affiliations "
+      "(school_id, year, runner_id)",
+      "CREATE INDEX races_date ON races "
+      "(date, mens_distance, womens_distance)"]),
+    (2, "Add the seasons_bests table of each runner's best time at each "
+     "distance in each season.",
+     [lambda: SeasonsBests.createTable(ifNotExists=True),
+      "CREATE UNIQUE INDEX seasons_bests_runner ON seasons_bests "
+      "(runner_id, season, distance)",
+      "CREATE INDEX seasons_bests_season ON seasons_bests "
+      "(season, distance, time)",
+      SeasonsBests.rebuild]),
+    (3, "Add the table_versions table that keeps the name cache fresh.",
+     [lambda: TableVersions.createTable(ifNotExists=True),
+      seed_table_versions]),
+]
+
+def applied():
+    """The numbers of the migrations that have been applied to the database.
+    Creates the schema_migrations table if it does not exist."""
+    SchemaMigrations.createTable(ifNotExists=True)
+    return set(row.migration for row in SchemaMigrations.select())
+
+def pending():
+    """The migrations that have not been applied to the database, in
+    order."""
+    done = applied()
+    return [migration for migration in MIGRATIONS if migration[0] not in done]
+
+def migrate():
+    """Apply every pending migration, each in its own transaction.  Returns
+    the migrations applied.  Whether the seasons_bests and table_versions
+    tables exist is checked again afterwards, so that tables added by the
+    migrations, or by new_database before it calls this, are used at once."""
+    migrations = pending()
+    for migration in migrations:
+        sqlhub.doInTransaction(_apply, migration)
+    SeasonsBests.forget()
+    TableVersions.forget()
+    return migrations
+
+def _apply((number, description, steps)):
+    """Run the steps of a migration and record it."""
+    connection = sqlhub.getConnection()
+    for step in steps:
+        if callable(step):
+            step()
+        else:
+            connection.query(step)
+    SchemaMigrations(migration=number, description=description)
@@ -1,5 +1,6 @@
 """Table models and useful data structures."""
 
+from collections import namedtuple
 from datetime import date
 from extensions.collections import OrderedDict
 from operator import attrgetter, eq, ge
@@ -7,16 +8,165 @@ from sqlobject import BoolCol, DateCol, EnumCol, FloatCol, ForeignKey, IntCol
 from sqlobject import RelatedJoin, sqlhub, SQLObject, SQLObjectNotFound
 from sqlobject import StringCol
 from sqlobject import connectionForURI as connection_for_URI
-from sqlobject.sqlbuilder import AND, IN, INNERJOINOn, OR
+from sqlobject.dberrors import OperationalError, ProgrammingError
+from sqlobject.events import listen, RowCreatedSignal, RowDestroySignal
+from sqlobject.events import RowUpdateSignal
+from sqlobject.sqlbuilder import AND, Delete, func, IN, INNERJOINOn, Insert
+from sqlobject.sqlbuilder import LEFTJOINOn, OR, Select, SQLExpression
+from sqlobject.sqlbuilder import SQLObjectState, sqlrepr
 from sys import stderr
 
+from cache import name_cache
 from scoring import RaceTime
 
+#The number of rows written by each multi-row INSERT statement
+INSERT_BATCH_SIZE = 500
+#The number of rows fetched at a time by stream_rows
+FETCH_BATCH_SIZE = 500
+
+def insert_many(cls, rows, connection=None):
+    """Insert the given rows, dictionaries from attribute name to value, into
+    the table of cls with one multi-row INSERT per INSERT_BATCH_SIZE rows.
+    The rows bypass SQLObject, so no instances are created and the version of
+    the table is bumped here instead, but each value is still checked and
+    converted by the validator of its column."""
+    if connection is None:
+        connection = cls._connection
+    columns = cls.sqlmeta.columns
+    state = SQLObjectState(cls, connection=connection)
+    def convert(name, value):
+        from_python = getattr(cls, "_SO_from_python_" + name, None)
+        return from_python(value, state) if from_python else value
+    rows = [dict((columns[name].dbName, convert(name, value))
+                 for name, value in row.iteritems()) for row in rows]
+    for i in xrange(0, len(rows), INSERT_BATCH_SIZE):
+        batch = rows[i:i + INSERT_BATCH_SIZE]
+        insert = Insert(cls.sqlmeta.table, valueList=batch)
+        connection.query(connection.sqlrepr(insert))
+    if len(rows) > 0 and cls.sqlmeta.table in TableVersions.tracked:
+        TableVersions.bump(cls.sqlmeta.table)
+
+def distance_column(gender):
+    """The column of the races table that holds the distance run by the given
+    gender."""
+    return Races.q.mens_distance if gender == "M" else Races.q.womens_distance
+
+def season_range(seasons):
+    """A condition on the date of a race that holds if it was run in one of
+    the given seasons.  Consecutive seasons are joined into a single range of
+    dates, so that the index on the date can be used."""
+    seasons = sorted(set(seasons))
+    ranges = []
+    for season in seasons:
+        if len(ranges) > 0 and ranges[-1][1] == season - 1:
+            ranges[-1][1] = season
+        else:
+            ranges.append([season, season])
+    return OR(*[AND(Races.q.date >= date(first, 1, 1),
+                    Races.q.date <= date(last, 12, 31))
+                for first, last in ranges])
+
+class SeasonOf(SQLExpression):
+    """The season, out of the given seasons, in which a race was run: a CASE
+    over ranges of dates, which every database understands.  Races outside
+    of the seasons have a season of NULL."""
+
+    def __init__(self, seasons):
+        self.seasons = sorted(set(seasons))
+
+    def __sqlrepr__(self, db):
+        cases = ["WHEN %s THEN %d" % (sqlrepr(season_range([season]), db),
+                                      season)
+                 for season in self.seasons]
+        return "(CASE %s END)" % " ".join(cases)
+
+    def components(self):
+        return [Races.q.date]
+
+class ByGender(SQLExpression):
+    """One of two values, chosen by the gender of the runner: a CASE over the
+    gender column of the runners table."""
+
+    def __init__(self, men, women):
+        self.men = men
+        self.women = women
+
+    def __sqlrepr__(self, db):
+        return "(CASE WHEN %s = 'M' THEN %s ELSE %s END)" % \
+                (sqlrepr(Runners.q.gender, db), sqlrepr(self.men, db),
+                 sqlrepr(self.women, db))
+
+    def components(self):
+        return [Runners.q.gender, self.men, self.women]
+
+def stream_rows(select, connection):
+    """Generate the rows of the given Select as they are fetched from the
+    database, rather than fetching them all first as queryAll does."""
+    database = connection.getConnection()
+    try:
+        cursor = database.cursor()
+        cursor.execute(connection.sqlrepr(select))
+        while True:
+            rows = cursor.fetchmany(FETCH_BATCH_SIZE)
+            if not rows:
+                break
+            for row in rows:
+                yield row
+        cursor.close()
+    finally:
+        connection.releaseConnection(database)
+
+def name_key(*names):
+    """The given names as unicode, so that names read from the database can
+    be compared with names given as UTF-8 strings."""
+    return tuple(name.decode("utf-8") if isinstance(name, str) else name
+                 for name in names)
+
+def to_date(value):
+    """Convert a date read from the database, which SQLite returns as a
+    string of the form YYYY-MM-DD, to a date."""
+    if isinstance(value, basestring):
+        return date(*map(int, value[:10].split("-")))
+    return value
+
 #Table wrappers
-def searchable_by_name(get_by_name=None):
+def cache_by_name(get_by_name, matches):
+    """Wrap a get_by_name function so that the ID of the object it finds is
+    kept in the persistent name cache until the table is next changed.
+    matches, which takes the object and the arguments of get_by_name, checks
+    that a cached object still fits the lookup."""
+    def cached_get_by_name(cls, *args, **kwargs):
+        table = cls.sqlmeta.table
+        version = None
+        if kwargs.get("connection") is None:
+            version = TableVersions.current(table)
+        if version is None:
+            return get_by_name(cls, *args, **kwargs)
+        uri = cls._connection.uri()
+        name = repr((args, sorted(kwargs.items())))
+        id_ = name_cache.get(uri, table, name, version)
+        if id_ is not None:
+            #The version guarantees the row has not changed since it was
+            #found; the check only guards against a corrupt cache
+            try:
+                found = super(cls, cls).get(id_)
+            except SQLObjectNotFound:
+                found = None
+            if found is not None and matches(found, *args, **kwargs):
+                return found
+        found = get_by_name(cls, *args, **kwargs)
+        name_cache.put(uri, table, name, version, found.id)
+        return found
+    cached_get_by_name.__doc__ = get_by_name.__doc__
+    return cached_get_by_name
+
+def searchable_by_name(get_by_name=None, matches=None):
     """Add a get_by_name function to the class, and modify the get function so
     that it attempts to call get_by_name if it cannot resolve the requested id
-    to an integer."""
+    to an integer.  Names found by get_by_name are cached between runs, and
+    the class is registered to have its table version bumped whenever it is
+    changed.  A custom get_by_name must come with a matches function that
+    checks whether an object fits the arguments of a lookup."""
     if get_by_name is None:
         def get_by_name(cls, name, connection=None):
             """Find the object with the given name."""
@@ -26,7 +176,9 @@ def searchable_by_name(get_by_name=None):
             if found.count() == 0:
                 raise SQLObjectNotFound("Could not find \"%s\"." % name)
             raise TooManyObjectsError
-    get_by_name = classmethod(get_by_name)
+        def matches(found, name, connection=None):
+            return name_key(found.name) == name_key(name)
+    get_by_name = classmethod(cache_by_name(get_by_name, matches))
     def decorator(to_decorate):
         @classmethod
         def get(cls, *args, **kwargs):
@@ -38,9 +190,78 @@ def searchable_by_name(get_by_name=None):
                 return cls.get_by_name(*args, **kwargs)
         to_decorate.get = get
         to_decorate.get_by_name = get_by_name
+        TableVersions.track(to_decorate)
         return to_decorate
     return decorator
 
+class TableVersions(SQLObject):
+    """A counter for each table that is bumped whenever a row of the table is
+    created, changed or destroyed.  Used to invalidate the name cache."""
+    table_name = StringCol(alternateID=True)
+    version = IntCol(default=0)
+
+    _versions = {}
+    #The tables whose versions are kept
+    tracked = set()
+
+    @classmethod
+    def available(cls):
+        """Whether this table exists in the connected database.  It does not in
+        databases created before it was introduced, until migrate.py adds it,
+        and versions are then neither recorded nor used.  The first call reads
+        every version."""
+        uri = cls._connection.uri()
+        if uri not in cls._versions:
+            try:
+                cls._versions[uri] = dict((row.table_name, row.version)
+                                          for row in cls.select())
+            except (OperationalError, ProgrammingError):
+                cls._versions[uri] = None
+        return cls._versions[uri] is not None
+
+    @classmethod
+    def forget(cls):
+        """Forget the versions read from every database, so that they are read
+        again, along with whether the table exists."""
+        cls._versions.clear()
+
+    @classmethod
+    def bump(cls, table):
+        """Record a change to the given table."""
+        if not cls.available():
+            return
+        try:
+            row = cls.byTable_name(table)
+        except SQLObjectNotFound:
+            row = cls(table_name=table, version=1)
+        else:
+            row.version += 1
+        cls._versions[cls._connection.uri()][table] = row.version
+
+    @classmethod
+    def track(cls, table_class):
+        """Bump the version of the table of the given class whenever one of
+        its rows is created, changed or destroyed."""
+        def bump(instance, *args):
+            cls.bump(table_class.sqlmeta.table)
+        cls.tracked.add(table_class.sqlmeta.table)
+        for signal in (RowCreatedSignal, RowDestroySignal, RowUpdateSignal):
+            listen(bump, table_class, signal, weak=False)
+
+    @classmethod
+    def current(cls, table):
+        """The current version of the given table, or None if versions are not
+        available."""
+        if not cls.available():
+            return None
+        return cls._versions[cls._connection.uri()].get(table, 0)
+
+class SchemaMigrations(SQLObject):
+    """The migrations that have been applied to the schema of the database.
+    See migrations.py."""
+    migration = IntCol(alternateID=True)
+    description = StringCol()
+
 class Affiliations(SQLObject):
     """Who ran for which school in which year."""
     runner = ForeignKey("Runners", cascade=False)
@@ -56,7 +277,11 @@ def get_conference_by_name(cls, name, connection=None):
         raise SQLObjectNotFound("Could not find \"%s\"." % name)
     raise TooManyObjectsError
 
-@searchable_by_name(get_conference_by_name)
+def conference_matches(found, name, connection=None):
+    return name_key(name) in (name_key(found.name),
+                              name_key(found.abbreviation))
+
+@searchable_by_name(get_conference_by_name, conference_matches)
 class Conferences(SQLObject):
     name = StringCol()
     abbreviation = StringCol()
@@ -83,7 +308,12 @@ def get_race_by_name(cls, name, year=date.today().year, connection=None):
         raise SQLObjectNotFound("Could not find \"%s\"." % name)
     raise TooManyObjectsError("More than one race \"%s\" found." % name)
 
-@searchable_by_name(get_race_by_name)
+def race_matches(found, name, year=date.today().year, connection=None):
+    return found.meet is not None and \
+            name_key(found.meet.name) == name_key(name) and \
+            found.date.year == year
+
+@searchable_by_name(get_race_by_name, race_matches)
 class Races(SQLObject):
     """A race is one instance of a meet."""
     meet = ForeignKey("Meets", cascade=False)
@@ -104,6 +334,38 @@ class Races(SQLObject):
             return self.womens_distance
         raise ValueError("'%s' is not a gender." % gender)
 
+    @classmethod
+    def catalog(cls, seasons=None, since=None, limit=None, offset=0,
+                connection=None):
+        """Generate a CatalogEntry for each race, sorted by date and then by
+        the name of the meet.  Only races run in the given seasons, if any,
+        and on or after the given date, if any, are included; limit and
+        offset page through them.  The races are read together with their
+        meets and venues in a single query, and generated as they are
+        fetched."""
+        if connection is None:
+            connection = cls._connection
+        join = [LEFTJOINOn(cls, Meets, cls.q.meet == Meets.q.id),
+                LEFTJOINOn(None, Venues, cls.q.venue == Venues.q.id)]
+        conditions = []
+        if seasons is not None:
+            conditions.append(season_range(seasons))
+        if since is not None:
+            conditions.append(cls.q.date >= since)
+        clauses = {}
+        if len(conditions) > 0:
+            clauses["where"] = AND(*conditions)
+        items = [cls.q.id, Meets.q.name, cls.q.date, cls.q.mens_distance,
+                 cls.q.womens_distance, Venues.q.name, Venues.q.city,
+                 Venues.q.state]
+        end = offset + limit if limit is not None else None
+        select = Select(items, join=join,
+                        orderBy=[cls.q.date, Meets.q.name, cls.q.id],
+                        start=offset, end=end, **clauses)
+        for row in stream_rows(select, connection):
+            entry = CatalogEntry(*row)
+            yield entry._replace(date=to_date(entry.date))
+
     @property
     def location(self):
         """Get the location of the race."""
@@ -112,23 +374,45 @@ class Races(SQLObject):
     #Helper methods
 
     def add_results(self, results):
-        """Add the given results to the database."""
-        for result in results:
-            Results(runner=result["runner_id"], race=self, time=result["time"])
+        """Add the given results to the database.  All of the results are
+        written in a single transaction, so if any of them cannot be saved,
+        none of them are."""
+        sqlhub.doInTransaction(self._insert_results, results)
+
+    def _insert_results(self, results):
+        """Add the given results to the database using multi-row INSERTs, and
+        update the season's bests of their runners."""
+        rows = [{"runnerID": result["runner_id"], "raceID": self.id,
+                 "time": result["time"]} for result in results]
+        insert_many(Results, rows)
+        if SeasonsBests.available():
+            SeasonsBests.refresh(self.date.year,
+                                 [result["runner_id"] for result in results])
 
     @classmethod
     def create(cls, name, date, venue, mens_distance, womens_distance, comments,
                results):
-        """Save a race and its results to the database."""
+        """Save a race and its results to the database in a single
+        transaction."""
+        return sqlhub.doInTransaction(cls.create_with_results, name, date,
+                                      venue, mens_distance, womens_distance,
+                                      comments, results)
+
+    @classmethod
+    def create_with_results(cls, name, date, venue, mens_distance,
+                            womens_distance, comments, results):
+        """Save a race and its results to the database, in the transaction of
+        the caller if there is one."""
         try:
             meet = Meets.get_by_name(name)
         except SQLObjectNotFound:
-            print >> stderr, "No meet %s found; creating new one."
+            print >> stderr, "No meet %s found; creating new one." % name
             meet = Meets(name=name)
         race = cls(meet=meet, date=date, venue=venue,
                    mens_distance=mens_distance, womens_distance=womens_distance,
                    comments=comments)
-        race.add_results(results)
+        race._insert_results(results)
+        return race
 
 class Results(SQLObject):
     """Who ran which time at which race."""
@@ -143,6 +427,43 @@ class Results(SQLObject):
 
     #Helper methods
 
+    @classmethod
+    def fastest(cls, races, gender, year, connection=None):
+        """Find the fastest result of every runner of the given gender in any
+        of the given races, relative to the distance of each race, together
+        with the school the runner was affiliated with in the given year.
+        Runners with no such affiliation have a school of None.  Everything is
+        fetched in a single query; returns a list of SeasonsBest instances
+        sorted from fastest to slowest."""
+        if connection is None:
+            connection = cls._connection
+        join = [INNERJOINOn(cls, Runners, cls.q.runner == Runners.q.id),
+                INNERJOINOn(None, Races, cls.q.race == Races.q.id),
+                LEFTJOINOn(None, Affiliations,
+                           AND(Affiliations.q.runner == Runners.q.id,
+                               Affiliations.q.year == year)),
+                LEFTJOINOn(None, Schools,
+                           Affiliations.q.school == Schools.q.id)]
+        query = AND(IN(cls.q.race, [race.id for race in races]),
+                    Runners.q.gender == gender)
+        items = [Runners.q.id, Runners.q.given_name, Runners.q.surname,
+                 Runners.q.year, Schools.q.name, cls.q.race, cls.q.time]
+        select = Select(items, where=query, join=join,
+                        orderBy=cls.q.time / distance_column(gender))
+        races = dict((race.id, race) for race in races)
+        runners = set()
+        fastest = []
+        for row in connection.queryAll(connection.sqlrepr(select)):
+            runner_id, given_name, surname, graduation_year, school, race_id, \
+                    time = row
+            if runner_id not in runners:
+                runners.add(runner_id)
+                fastest.append(SeasonsBest(runner_id,
+                                           given_name + " " + surname,
+                                           graduation_year, school,
+                                           races[race_id], RaceTime(time)))
+        return fastest
+
     def scaled_time(self, scale_to):
         """Linearly scale the time to another race distance."""
         gender = self.runner.gender
@@ -169,7 +490,14 @@ def get_runner_by_name(cls, surname, given_name=None, year=None,
     raise TooManyObjectsError("More than one runner \"%s, %s (%s)\" found." %
                               (surname, given_name, year))
 
-@searchable_by_name(get_runner_by_name)
+def runner_matches(found, surname, given_name=None, year=None,
+                   connection=None):
+    return name_key(found.surname) == name_key(surname) and \
+            (given_name is None or
+             name_key(given_name) in map(name_key, found.given_names)) and \
+            (year is None or found.year == year)
+
+@searchable_by_name(get_runner_by_name, runner_matches)
 class Runners(SQLObject):
     surname = StringCol()
     given_name = StringCol()
@@ -199,31 +527,117 @@ class Runners(SQLObject):
     def create(cls, given_name, surname, school, gender, year=None,
                nicknames=None, competition_year=None):
         """Create a new runner and their affiliations."""
-        if competition_year is None:
-            competiton_year = date.today().year
-        runner = cls(given_name=given_name, surname=surname, school=school,
-                     gender=gender, nicknames=nicknames, year=year)
-        Affiliations(runner=runner, school=school, year=competition_year)
+        runner = {"given_name": given_name, "surname": surname,
+                  "school": school, "gender": gender, "year": year,
+                  "nicknames": nicknames, "competition_year": competition_year}
+        return cls.create_many([runner])[0]
+
+    @classmethod
+    def create_many(cls, runners):
+        """Create new runners and their affiliations.  Each runner is a
+        dictionary of the arguments to create().  Everything is written in a
+        single transaction, so if any runner cannot be saved, none of them
+        are.  Returns the new runners."""
+        return sqlhub.doInTransaction(cls._create_many, runners)
+
+    @classmethod
+    def _create_many(cls, runners):
+        """Create new runners, then their affiliations, using multi-row
+        INSERTs, and read the new runners back with one query."""
+        connection = cls._connection
+        rows = []
+        for runner in runners:
+            rows.append({"given_name": runner["given_name"],
+                         "surname": runner["surname"],
+                         "gender": runner["gender"],
+                         "nicknames": runner.get("nicknames"),
+                         "year": runner.get("year")})
+        select = Select([func.MAX(cls.q.id)])
+        last_id = connection.queryOne(connection.sqlrepr(select))[0] or 0
+        insert_many(cls, rows)
+        #Each INSERT numbers its rows in order, and rows inserted meanwhile by
+        #other connections are told apart by name
+        items = [cls.q.id] + [getattr(cls.q, column.name)
+                              for column in cls.sqlmeta.columnList]
+        select = Select(items, where=cls.q.id > last_id, orderBy=cls.q.id)
+        inserted = {}
+        for row in connection.queryAll(connection.sqlrepr(select)):
+            new_runner = cls.get(row[0], connection, selectResults=row[1:])
+            key = name_key(new_runner.surname, new_runner.given_name)
+            inserted.setdefault(key, []).append(new_runner)
+        created = [inserted[name_key(row["surname"], row["given_name"])].pop(0)
+                   for row in rows]
+        affiliations = []
+        for runner, new_runner in zip(runners, created):
+            competition_year = runner.get("competition_year")
+            if competition_year is None:
+                competition_year = date.today().year
+            school = runner["school"]
+            affiliations.append({"runnerID": new_runner.id,
+                                 "schoolID": getattr(school, "id", school),
+                                 "year": competition_year})
+        insert_many(Affiliations, affiliations)
+        return created
 
     def performances(self, distance, year=None, strict=False):
-        """All the runenrs performances at the given distance.  If strict is
+        """All the runner's performances at the given distance.  If strict is
         true, only races that are exactly the given distance are considered.
-        Otherwise, all longer races are scaled down to the given distance."""
+        Otherwise, all longer races are considered."""
         join = INNERJOINOn(Races, Results, Results.q.race == Races.q.id)
         compare = [ge, eq][strict]
-        distance_query = {"M": compare(Races.q.mens_distance, distance),
-                          "F": compare(Races.q.womens_distance, distance)}
-        distance_query = distance_query[self.gender]
-        query = AND(distance_query, Results.q.runner == self)
+        query = AND(Results.q.runner == self,
+                    compare(distance_column(self.gender), distance))
         if year is not None:
-            query = AND(Races.q.date >= date(year, 1, 1), Races.q.date <=
-                        date(year, 12, 31), query)
+            query = AND(query, season_range([year]))
         return Results.select(query, join=join)
 
+    @classmethod
+    def best_performances(cls, runners, distance, seasons=None, strict=False,
+                          connection=None):
+        """Find the best performance of each of the given runners at the
+        given distance in each of the given seasons, or in any season if
+        none are given.  Longer races are scaled down to the given distance
+        unless strict is true, in which case only races of exactly the given
+        distance are considered.  The minimum is taken by the database, from
+        the seasons_bests table if it exists and otherwise from the results,
+        in one query for each gender among the runners.  Returns a dictionary
+        from (runner ID, season) to the best time, where the season is None
+        if no seasons were given."""
+        if connection is None:
+            connection = cls._connection
+        if SeasonsBests.available():
+            return SeasonsBests.best_performances(runners, distance, seasons,
+                                                  strict, connection)
+        compare = [ge, eq][strict]
+        by_gender = {}
+        for runner in runners:
+            by_gender.setdefault(runner.gender, []).append(runner.id)
+        bests = {}
+        for gender, runner_ids in by_gender.iteritems():
+            column = distance_column(gender)
+            query = AND(Results.q.race == Races.q.id,
+                        IN(Results.q.runner, runner_ids),
+                        compare(column, distance))
+            group = [Results.q.runner]
+            if seasons is not None:
+                query = AND(query, season_range(seasons))
+                group.append(SeasonOf(seasons))
+            items = group + [func.MIN(Results.q.time / column * distance)]
+            select = Select(items, where=query, groupBy=group)
+            for row in connection.queryAll(connection.sqlrepr(select)):
+                season = row[1] if seasons is not None else None
+                bests[row[0], season] = RaceTime(row[-1])
+        return bests
+
     def personal_record(self, distance, strict=False):
-        """The runner's personal record at the given distance.  If strict is
-        true, will only return those results at exactly the given distance."""
-        return min(self.performances(), key=attrgetter("time"))
+        """The runner's personal record at the given distance, scaled down
+        from longer races unless strict is true.  Raises a
+        DidNotCompeteError if they have not run such a race."""
+        bests = Runners.best_performances([self], distance, strict=strict)
+        try:
+            return bests[self.id, None]
+        except KeyError:
+            raise DidNotCompeteError
 
     def school(self, year=date.today().year):
         """Indicates which school the runner was affiliated with in the given
@@ -234,16 +648,42 @@ class Runners(SQLObject):
             raise NotAffiliatedError
 
     def schools(self):
-        """The schools the runner has been affiliated with."""
-        schools = OrderedDict()
-        affiliations = Affiliations.select(Affiliations.q.runner == self,
-                                           orderBy="year")
-        for affiliation in affiliations:
-            try:
-                schools[affiliation.school].append(affiliation.year)
-            except KeyError:
-                schools[affiliation.school] = [affiliation.year]
-        return schools
+        """The schools the runner has been affiliated with, mapped to the
+        years of each affiliation."""
+        return Runners.affiliation_histories([self]).get(self.id,
+                                                         OrderedDict())
+
+    @classmethod
+    def affiliation_histories(cls, runners=None, connection=None):
+        """The schools each of the given runners, or every runner if none are
+        given, has been affiliated with, as schools() finds them for one
+        runner.  The affiliations and their schools are read with a single
+        joined query.  Returns a dictionary from runner ID to an OrderedDict
+        from School to the years of the affiliation; runners with no
+        affiliations are left out."""
+        if connection is None:
+            connection = cls._connection
+        items = [Affiliations.q.runner, Affiliations.q.year, Schools.q.id]
+        items += [getattr(Schools.q, column.name)
+                  for column in Schools.sqlmeta.columnList]
+        query = Affiliations.q.school == Schools.q.id
+        if runners is not None:
+            runner_ids = [getattr(runner, "id", runner) for runner in runners]
+            query = AND(query, IN(Affiliations.q.runner, runner_ids))
+        select = Select(items, where=query,
+                        orderBy=[Affiliations.q.runner, Affiliations.q.year,
+                                 Affiliations.q.id])
+        histories = {}
+        schools = {}
+        for row in connection.queryAll(connection.sqlrepr(select)):
+            runner_id, year, school_id = row[:3]
+            if school_id not in schools:
+                #The school's columns were fetched with the affiliation
+                schools[school_id] = Schools.get(school_id, connection,
+                                                 selectResults=row[3:])
+            history = histories.setdefault(runner_id, OrderedDict())
+            history.setdefault(schools[school_id], []).append(year)
+        return histories
 
     def schools_by_year(self):
         """The schools the runner is affiliated with by year."""
@@ -255,15 +695,105 @@ class Runners(SQLObject):
         return years
 
     def seasons_best(self, distance, season, strict=False):
-        """Finds a runners season's best in the specified season.  Raises a
-        DidNotCompeteError if they did not compete in that season.  If strict
-        is true, considers only those races at the exact distance given."""
-        found = self.performances(distance, season, strict)
+        """Finds a runner's season's best in the specified season, scaled
+        down from longer races.  Raises a DidNotCompeteError if they did not
+        compete in that season.  If strict is true, considers only those races
+        at the exact distance given."""
+        bests = Runners.best_performances([self], distance, [season], strict)
         try:
-            return min(found, key=attrgetter("time"))
-        except ValueError:
+            return bests[self.id, season]
+        except KeyError:
             raise DidNotCompeteError
 
+    @classmethod
+    def _scaled_performances(cls, gender, distance, schools, year,
+                             previous_years, strict, connection):
+        """Query the performances of every runner of the given gender who was
+        affiliated with one of the given schools in the given year, in that
+        season and the given number of previous seasons, with times scaled to
+        the given distance.  Returns rows of (runner ID, given name, surname,
+        graduation year, school name, race ID, scaled time), ordered by runner
+        and then by scaled time."""
+        if connection is None:
+            connection = cls._connection
+        compare = [ge, eq][strict]
+        column = distance_column(gender)
+        scaled_time = Results.q.time / column * distance
+        query = AND(Results.q.runner == cls.q.id,
+                    Results.q.race == Races.q.id,
+                    Affiliations.q.runner == cls.q.id,
+                    Affiliations.q.school == Schools.q.id,
+                    cls.q.gender == gender,
+                    Affiliations.q.year == year,
+                    IN(Affiliations.q.school, schools),
+                    compare(column, distance),
+                    season_range(xrange(year - previous_years, year + 1)))
+        items = [cls.q.id, cls.q.given_name, cls.q.surname, cls.q.year,
+                 Schools.q.name, Results.q.race, scaled_time]
+        select = Select(items, where=query, orderBy=[cls.q.id, scaled_time])
+        return connection.queryAll(connection.sqlrepr(select))
+
+    @classmethod
+    def seasons_bests(cls, gender, distance, schools, year, previous_years=0,
+                      strict=False, connection=None):
+        """Find the season's best of every runner of the given gender who was
+        affiliated with one of the given schools in the given year, searching
+        that season and the given number of previous seasons.  Times are scaled
+        to the given distance.  If strict is true, considers only those races
+        at the exact distance given.  All the bests are found in a single
+        query, of the seasons_bests table if it exists; returns a list of
+        SeasonsBest instances sorted by time."""
+        if SeasonsBests.available():
+            performances = SeasonsBests.scaled_performances
+        else:
+            performances = cls._scaled_performances
+        #Rows are ordered by runner, then time, so the first row seen for each
+        #runner is their season's best.
+        bests = []
+        previous_id = None
+        for row in performances(gender, distance, schools, year,
+                                previous_years, strict, connection):
+            runner_id, given_name, surname, graduation_year, school, race_id, \
+                    time = row
+            if runner_id != previous_id:
+                bests.append((runner_id, given_name + " " + surname,
+                              graduation_year, school, race_id,
+                              RaceTime(time)))
+                previous_id = runner_id
+        race_ids = set(best[4] for best in bests)
+        races = {}
+        if race_ids:
+            for race in Races.select(IN(Races.q.id, list(race_ids)),
+                                     connection=connection):
+                races[race.id] = race
+        bests = [SeasonsBest(runner_id, name, graduation_year, school,
+                             races[race_id], time)
+                 for runner_id, name, graduation_year, school, race_id, time
+                 in bests]
+        bests.sort(key=attrgetter("time"))
+        return bests
+
+    @classmethod
+    def performance_histories(cls, gender, distance, schools, year,
+                              previous_years=0, strict=False, connection=None):
+        """Find every performance of the runners that seasons_bests() would
+        consider, in a single query.  Returns a list of PerformanceHistory
+        instances, each with the runner's scaled times from fastest to
+        slowest."""
+        histories = []
+        for row in cls._scaled_performances(gender, distance, schools, year,
+                                            previous_years, strict,
+                                            connection):
+            runner_id, given_name, surname, graduation_year, school, race_id, \
+                    time = row
+            if len(histories) == 0 or histories[-1].runner_id != runner_id:
+                histories.append(PerformanceHistory(runner_id,
+                                                    given_name + " " + surname,
+                                                    graduation_year, school,
+                                                    []))
+            histories[-1].times.append(time)
+        return histories
+
 @searchable_by_name()
 class Schools(SQLObject):
     name = StringCol()
@@ -298,16 +828,200 @@ class Schools(SQLObject):
 
     def team(self, year=date.today().year, gender=None):
         """Search the database for the team fielded in the specified year by the
-        specified school."""
-        key = lambda runner: (runner.surname, runner.given_name)
-        join = INNERJOINOn(Affiliations, Runners, Affiliations.q.runner ==
-                           Runners.q.id)
-        query = AND(Affiliations.q.school == self, Affiliations.q.year == year)
+        specified school.  The runners are read and sorted by name in a single
+        query."""
+        query = AND(Affiliations.q.runner == Runners.q.id,
+                    Affiliations.q.school == self.id,
+                    Affiliations.q.year == year)
         if gender is not None:
             query = AND(query, Runners.q.gender == gender)
-        affiliations = Affiliations.select(query, join=join)
-        runners = (affiliation.runner for affiliation in affiliations)
-        return sorted(runners, key=key)
+        return list(Runners.select(query, orderBy=[Runners.q.surname,
+                                                   Runners.q.given_name,
+                                                   Runners.q.id]))
+
+    @classmethod
+    def rosters(cls, schools, seasons, mens_distance, womens_distance,
+                strict=False, connection=None):
+        """The teams fielded by each of the given schools in each of the given
+        seasons, with the season's best of each runner at the given distance
+        for their gender, scaled down from longer races unless strict is
+        true.  The runners and their bests are read in a single joined query,
+        from the seasons_bests table if it exists and otherwise from the
+        results.  Returns a list of RosterEntry instances sorted by school,
+        in the order given, then by season and name; the time is None for
+        runners who did not race that season."""
+        if connection is None:
+            connection = cls._connection
+        compare = [ge, eq][strict]
+        distance = ByGender(mens_distance, womens_distance)
+        join = [INNERJOINOn(Affiliations, Runners,
+                            Affiliations.q.runner == Runners.q.id)]
+        if SeasonsBests.available():
+            join.append(LEFTJOINOn(None, SeasonsBests,
+                                   AND(SeasonsBests.q.runner == Runners.q.id,
+                                       SeasonsBests.q.season ==
+                                       Affiliations.q.year,
+                                       compare(SeasonsBests.q.distance,
+                                               distance))))
+            scaled_time = SeasonsBests.q.time / SeasonsBests.q.distance * \
+                    distance
+        else:
+            column = ByGender(Races.q.mens_distance, Races.q.womens_distance)
+            join += [LEFTJOINOn(None, Results,
+                                Results.q.runner == Runners.q.id),
+                     LEFTJOINOn(None, Races,
+                                AND(Results.q.race == Races.q.id,
+                                    SeasonOf(seasons) == Affiliations.q.year,
+                                    compare(column, distance)))]
+            #Results of races outside the season have no race, and so no time
+            scaled_time = Results.q.time / column * distance
+        school_ids = [school.id for school in schools]
+        runner_columns = [Runners.q.id]
+        runner_columns += [getattr(Runners.q, column.name)
+                           for column in Runners.sqlmeta.columnList]
+        group = [Affiliations.q.school, Affiliations.q.year] + runner_columns
+        select = Select(group + [func.MIN(scaled_time)], join=join,
+                        where=AND(IN(Affiliations.q.school, school_ids),
+                                  IN(Affiliations.q.year, list(seasons))),
+                        groupBy=group,
+                        orderBy=[Affiliations.q.year, Runners.q.surname,
+                                 Runners.q.given_name, Runners.q.id])
+        by_id = dict((school.id, school) for school in schools)
+        roster = []
+        for row in connection.queryAll(connection.sqlrepr(select)):
+            school_id, season, runner_id = row[:3]
+            #The runner's columns were fetched with the affiliation
+            runner = Runners.get(runner_id, connection,
+                                 selectResults=row[3:-1])
+            time = RaceTime(row[-1]) if row[-1] is not None else None
+            roster.append(RosterEntry(by_id[school_id], season, runner, time))
+        #A stable sort keeps each team in order of season and name
+        roster.sort(key=lambda entry: school_ids.index(entry.school.id))
+        return roster
+
+class SeasonsBests(SQLObject):
+    """The best time of each runner at each distance in each season, kept up
+    to date as results are added so that season's bests and personal records
+    can be read without going through every result.  The distance is that of
+    the race for the runner's gender."""
+    runner = ForeignKey("Runners", cascade=False)
+    season = IntCol()
+    distance = IntCol()
+    time = FloatCol()
+    race = ForeignKey("Races", cascade=False)
+
+    _available = {}
+
+    @classmethod
+    def available(cls):
+        """Whether this table exists in the connected database.  It does not
+        until the migration that adds it has been applied, and until then
+        season's bests are found from the results table."""
+        uri = cls._connection.uri()
+        if uri not in cls._available:
+            try:
+                list(cls.select()[:1])
+                cls._available[uri] = True
+            except (OperationalError, ProgrammingError):
+                cls._available[uri] = False
+        return cls._available[uri]
+
+    @classmethod
+    def forget(cls):
+        """Forget whether the table exists in every database, so that it is
+        checked again."""
+        cls._available.clear()
+
+    @classmethod
+    def refresh(cls, season, runner_ids=None, connection=None):
+        """Recompute the bests of the given runners, or of every runner, in
+        the given season from the results table."""
+        if connection is None:
+            connection = cls._connection
+        query = AND(Results.q.runner == Runners.q.id,
+                    Results.q.race == Races.q.id, season_range([season]))
+        delete = cls.q.season == season
+        if runner_ids is not None:
+            runner_ids = list(set(runner_ids))
+            query = AND(query, IN(Results.q.runner, runner_ids))
+            delete = AND(delete, IN(cls.q.runner, runner_ids))
+        items = [Results.q.runner, Runners.q.gender, Races.q.mens_distance,
+                 Races.q.womens_distance, Results.q.race, Results.q.time]
+        bests = {}
+        for row in connection.queryAll(connection.sqlrepr(Select(items,
+                                                                 query))):
+            runner_id, gender, mens_distance, womens_distance, race_id, \
+                    time = row
+            distance = mens_distance if gender == "M" else womens_distance
+            key = runner_id, distance
+            if distance is not None and (key not in bests or
+                                         time < bests[key][1]):
+                bests[key] = race_id, time
+        connection.query(connection.sqlrepr(Delete(cls.sqlmeta.table,
+                                                   where=delete)))
+        rows = [{"runnerID": runner_id, "season": season,
+                 "distance": distance, "time": time, "raceID": race_id}
+                for (runner_id, distance), (race_id, time)
+                in bests.iteritems()]
+        insert_many(cls, rows, connection)
+
+    @classmethod
+    def rebuild(cls, connection=None):
+        """Recompute the whole table from the results table.  Returns the
+        number of rows written."""
+        if connection is None:
+            connection = cls._connection
+        connection.query(connection.sqlrepr(Delete(cls.sqlmeta.table,
+                                                   where=None)))
+        seasons = set(race.date.year for race in
+                      Races.select(connection=connection))
+        for season in sorted(seasons):
+            cls.refresh(season, connection=connection)
+        return cls.select(connection=connection).count()
+
+    @classmethod
+    def best_performances(cls, runners, distance, seasons, strict,
+                          connection):
+        """Same as Runners.best_performances."""
+        compare = [ge, eq][strict]
+        query = AND(IN(cls.q.runner, [runner.id for runner in runners]),
+                    compare(cls.q.distance, distance))
+        group = [cls.q.runner]
+        if seasons is not None:
+            query = AND(query, IN(cls.q.season, list(seasons)))
+            group.append(cls.q.season)
+        items = group + [func.MIN(cls.q.time / cls.q.distance * distance)]
+        select = Select(items, where=query, groupBy=group)
+        bests = {}
+        for row in connection.queryAll(connection.sqlrepr(select)):
+            season = row[1] if seasons is not None else None
+            bests[row[0], season] = RaceTime(row[-1])
+        return bests
+
+    @classmethod
+    def scaled_performances(cls, gender, distance, schools, year,
+                            previous_years, strict, connection):
+        """Same as Runners._scaled_performances, but with a row for each
+        runner's best at each distance in each season rather than for each
+        result."""
+        if connection is None:
+            connection = cls._connection
+        compare = [ge, eq][strict]
+        scaled_time = cls.q.time / cls.q.distance * distance
+        query = AND(cls.q.runner == Runners.q.id,
+                    Affiliations.q.runner == Runners.q.id,
+                    Affiliations.q.school == Schools.q.id,
+                    Runners.q.gender == gender,
+                    Affiliations.q.year == year,
+                    IN(Affiliations.q.school, schools),
+                    compare(cls.q.distance, distance),
+                    cls.q.season >= year - previous_years,
+                    cls.q.season <= year)
+        items = [Runners.q.id, Runners.q.given_name, Runners.q.surname,
+                 Runners.q.year, Schools.q.name, cls.q.race, scaled_time]
+        select = Select(items, where=query,
+                        orderBy=[Runners.q.id, scaled_time])
+        return connection.queryAll(connection.sqlrepr(select))
 
 def get_venue_by_name(cls, name, city=None, state=None):
     """Find the venue with the given name.  City or state may be specified
@@ -324,15 +1038,29 @@ def get_venue_by_name(cls, name, city=None, state=None):
         raise SQLObjectNotFound("No venue named %s could be found." % name)
     raise TooManyObjectsError("More than one venue %s found." % name)
 
-@searchable_by_name(get_venue_by_name)
+def venue_matches(found, name, city=None, state=None):
+    return name_key(found.name) == name_key(name) and \
+            (city is None or name_key(found.city) == name_key(city)) and \
+            (state is None or name_key(found.state) == name_key(state))
+
+@searchable_by_name(get_venue_by_name, venue_matches)
 class Venues(SQLObject):
     name = StringCol()
     city = StringCol()
     state = StringCol()
     elevation = IntCol()
 
-tables = [Affiliations, Conferences, Distances, Meets, Races, Results, Runners, Schools,
-          Venues]
+#Data structures
+
+PerformanceHistory = namedtuple("PerformanceHistory",
+                                "runner_id name year school times")
+SeasonsBest = namedtuple("SeasonsBest", "runner_id name year school race time")
+RosterEntry = namedtuple("RosterEntry", "school season runner time")
+CatalogEntry = namedtuple("CatalogEntry", "id meet date mens_distance "
+                          "womens_distance venue city state")
+
+tables = [Affiliations, Conferences, Distances, Meets, Races, Results, Runners,
+          SchemaMigrations, Schools, SeasonsBests, TableVersions, Venues]
 
 #Exceptions
 
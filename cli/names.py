@@ -0,0 +1,141 @@
+"""An in-memory index for resolving the runner and school names found in
+results sheets to their database ID numbers."""
+
+from datetime import date
+from sqlobject.sqlbuilder import AND, Select
+
+from models import Affiliations, Runners, Schools
+
+def normalize(name):
+    """Lower-case the name and collapse runs of whitespace."""
+    return " ".join(name.lower().split())
+
+class NameIndex(object):
+    """Maps normalized names to ID numbers.  Runners affiliated with a school
+    in the given year are kept in a hash map keyed by (surname, given name),
+    with one entry for the given name and each nickname.  School names and
+    nicknames are kept in a trie so that a team name is resolved by its
+    longest known prefix.  The whole index is loaded with two queries."""
+
+    def __init__(self, year=date.today().year, connection=None):
+        self.year = year
+        self.runners = {}
+        self.affiliations = {}
+        self.school_trie = {}
+        for school in Schools.select(connection=connection):
+            for name in [school.name] + school.nicknames:
+                self.add_school_name(name, school.id)
+        if connection is None:
+            connection = Runners._connection
+        items = [Runners.q.id, Runners.q.surname, Runners.q.given_name,
+                 Runners.q.nicknames, Affiliations.q.school]
+        query = AND(Runners.q.id == Affiliations.q.runner,
+                    Affiliations.q.year == year)
+        select = Select(items, where=query)
+        for row in connection.queryAll(connection.sqlrepr(select)):
+            runner_id, surname, given_name, nicknames, school_id = row
+            self.affiliations.setdefault(runner_id, set()).add(school_id)
+            given_names = [given_name]
+            if nicknames is not None:
+                given_names += nicknames.split(",")
+            for name in given_names:
+                key = normalize(surname), normalize(name)
+                self.runners.setdefault(key, set()).add(runner_id)
+
+    def add_school_name(self, name, school_id):
+        """Add one name of a school to the trie."""
+        node = self.school_trie
+        for character in normalize(name):
+            node = node.setdefault(character, {})
+        node.setdefault(None, set()).add(school_id)
+
+    def school(self, name):
+        """Find the ID of the school whose name or nickname is the longest
+        prefix of the given name, ending at a word boundary.  Returns None if
+        there is no such school and raises an AmbiguousNameError if the prefix
+        belongs to more than one school."""
+        name = normalize(name)
+        node = self.school_trie
+        found = None
+        for i, character in enumerate(name):
+            try:
+                node = node[character]
+            except KeyError:
+                break
+            if None in node and (i + 1 == len(name) or
+                                 not name[i + 1].isalnum()):
+                found = node[None]
+        if found is None:
+            return None
+        if len(found) > 1:
+            raise AmbiguousNameError(name, found)
+        return iter(found).next()
+
+    def runner(self, name, school_id=None):
+        """Find the ID of the runner with the given name, written either as
+        "Surname, Given" or "Given Surname".  If more than one runner has the
+        name, only those affiliated with the given school are considered, if
+        there are any.  Returns None if there is no such runner and raises an
+        AmbiguousNameError if more than one runner remains."""
+        found = set()
+        for key in self.name_keys(name):
+            found.update(self.runners.get(key, ()))
+        if len(found) > 1 and school_id is not None:
+            at_school = set(runner_id for runner_id in found
+                            if school_id in self.affiliations[runner_id])
+            if len(at_school) > 0:
+                found = at_school
+        if len(found) == 0:
+            return None
+        if len(found) > 1:
+            raise AmbiguousNameError(name, found)
+        return iter(found).next()
+
+    def resolve(self, item):
+        """Where possible, replace the name and school of a result, a
+        dictionary, with the ID numbers of the runner and school.  Returns a
+        list of the AmbiguousNameErrors raised by names that match more than
+        one runner or school, which are left as they are."""
+        errors = []
+        try:
+            school_id = self.school(item["school"])
+        except AmbiguousNameError, error:
+            errors.append(error)
+            school_id = None
+        if school_id is not None:
+            item["school_id"] = school_id
+            del item["school"]
+        try:
+            runner_id = self.runner(item["name"], school_id)
+        except AmbiguousNameError, error:
+            errors.append(error)
+            return errors
+        if runner_id is not None:
+            item["runner_id"] = runner_id
+            del item["name"]
+            item.pop("school", None)
+            item.pop("school_id", None)
+        return errors
+
+    @staticmethod
+    def name_keys(name):
+        """Generate the possible (surname, given name) keys for a name.  A name
+        without a comma may split into given name and surname after any of its
+        words."""
+        if "," in name:
+            surname, given_name = name.split(",", 1)
+            yield normalize(surname), normalize(given_name)
+            return
+        words = normalize(name).split(" ")
+        for i in xrange(1, len(words)):
+            yield " ".join(words[i:]), " ".join(words[:i])
+
+class AmbiguousNameError(Exception):
+    """Raised when a name matches more than one row."""
+
+    def __init__(self, name, ids):
+        message = "\"%s\" is ambiguous: it matches IDs %s." % \
+                (name, ", ".join(map(str, sorted(ids))))
+        super(AmbiguousNameError, self).__init__(message)
+        self.name = name
+        self.ids = ids
@@ -7,6 +7,7 @@ from miscellaneous import main_function
 from optparse import OptionParser
 from sqlobject import connectionForURI as connection_for_URI, sqlhub
 
+from migrations import migrate
 from models import Distances, tables
 
 DB_PREFIX = "xca_"
@@ -53,6 +54,7 @@ def create_database(system, host, root_password, name, username, distances):
     sqlhub.processConnection = connection
     for table in tables:
         table.createTable()
+    migrate()
     Distances(mens_distance=distances[0], womens_distance=distances[1])
 
 def uri(system, host, dbname, username=USERNAME, password=None):
@@ -0,0 +1,71 @@
+"""Writers that print the rows of a table one at a time, so that output begins
+with the first row and the rows never have to be held in memory together.
+formatting.Table, by contrast, must see every row before it can size its
+columns.  Tables are streamed either with columns of fixed width or in a
+machine-readable format: tab- or comma-separated values, or JSON Lines."""
+
+import csv
+from datetime import date
+import json
+
+from extensions.collections import OrderedDict
+
+#The width of the columns of a streamed table whose width is not given
+DEFAULT_WIDTH = 20
+
+def text(cell):
+    """The text of a cell, encoded as UTF-8."""
+    if isinstance(cell, unicode):
+        return cell.encode("utf-8")
+    return str(cell)
+
+def write_fixed_width(rows, stream, headings, widths=None, pads=None,
+                      column_seperator=" | "):
+    """Write each row with every column padded to the given width, or to
+    DEFAULT_WIDTH.  Longer cells are written whole, pushing the rest of their
+    row to the right, and the last column is not padded.  The headings are
+    not written, as formatting.Table does not write them either."""
+    for row in rows:
+        cells = []
+        for i, cell in enumerate(row):
+            cell = text(cell)
+            if i < len(row) - 1:
+                width = widths[i] if widths is not None else DEFAULT_WIDTH
+                pad = pads[i] if pads is not None else None
+                cell = (pad or str.ljust)(cell, width)
+            cells.append(cell)
+        stream.write(column_seperator.join(cells).rstrip())
+        stream.write("\n")
+
+def write_delimited(rows, stream, headings, delimiter):
+    """Write a line of headings, then each row as a line of values separated
+    by the delimiter.  None is written as an empty value."""
+    writer = csv.writer(stream, delimiter=delimiter, lineterminator="\n")
+    writer.writerow(headings)
+    for row in rows:
+        writer.writerow(["" if cell is None else text(cell) for cell in row])
+
+def write_csv(rows, stream, headings, widths=None, pads=None):
+    """Write the rows as comma-separated values."""
+    write_delimited(rows, stream, headings, ",")
+
+def write_tsv(rows, stream, headings, widths=None, pads=None):
+    """Write the rows as tab-separated values."""
+    write_delimited(rows, stream, headings, "\t")
+
+def write_json_lines(rows, stream, headings, widths=None, pads=None):
+    """Write each row as a JSON object from heading to cell.  Dates are
+    written as YYYY-MM-DD and other values that JSON cannot represent, such
+    as race times, as their text."""
+    def default(cell):
+        if isinstance(cell, date):
+            return cell.isoformat()
+        return str(cell)
+    for row in rows:
+        stream.write(json.dumps(OrderedDict(zip(headings, row)),
+                                default=default))
+        stream.write("\n")
+
+#The writers by name, for use with the --format option of the scripts
+WRITERS = {"csv": write_csv, "json-lines": write_json_lines,
+           "table": write_fixed_width, "tsv": write_tsv}
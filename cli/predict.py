@@ -4,22 +4,25 @@
 for the PRs of each runner in a season and scores those PRs like a race."""
 
 from datetime import date
-import hytek
+from formatting import Table
 from hytek import ResultsDumper, ScoreDumper
 from itertools import count
 from miscellaneous import main_function
-from operator import attrgetter
-from sqlobject.sqlbuilder import AND, IN, INNERJOINOn
-from xcanalyze.models import Affiliations, Conferences, Distances, \
-        DidNotCompeteError, Runners, Schools
+from operator import attrgetter, itemgetter
+from xcanalyze.models import Conferences, Distances, Runners, Schools
 from xcanalyze.scoring import AggregatedResults
 
-from common import connect, ConnectionError, GenderedOptionParser, \
-        race_display_options, RaceDumper, SeasonsBestDumper
+from common import ConnectionError, data_source_options, Finisher, \
+        GenderedOptionParser, open_data_source, race_display_options, \
+        RaceDumper, SeasonsBestDumper
+
+#The percentiles of each team's score shown by simulations
+SCORE_PERCENTILES = [10, 50, 90]
 
 def parse_arguments(arguments):
     "Parse command line arguments.  Returns the tuple (options, (gender,))."
     option_parser = race_display_options(GenderedOptionParser())
+    data_source_options(option_parser)
     option_parser.add_option("-c", "--conference", help="Include schools from "
                              "only the specified conference.")
     option_parser.add_option("-d", "--dist-limit", help="Minimum race "
@@ -27,34 +30,58 @@ def parse_arguments(arguments):
     option_parser.add_option("-f", "--filter", help="Include or exclude the "
                              "specified schools.")
     option_parser.add_option("-p", "--previous-years", default=0, type="int")
+    option_parser.add_option("--processes", help="Number of processes to run "
+                             "simulations in.  Defaults to one per CPU.",
+                             type="int")
+    option_parser.add_option("--seed", help="Seed for the random number "
+                             "generator used by simulations.", type="int")
+    option_parser.add_option("--simulate", help="Simulate the given number of "
+                             "races, drawing each runner's time from their "
+                             "past performances, and show each team's chance "
+                             "of finishing in each place.", metavar="N",
+                             type="int")
     option_parser.add_option("-y", "--year", default=date.today().year,
                              type="int")
     options, arguments = option_parser.parse_args(arguments[1:])
     index = count()
     try:
-        connect(options.server)
+        store = open_data_source(options)
         gender = arguments[next(index)]
     except IndexError:
         option_parser.error("")
     except ConnectionError, error:
         option_parser.error(error)
+    if store is None:
+        get_conference, get_distances = Conferences.get, Distances.get
+        conference_schools = lambda conference: \
+                list(Schools.selectBy(conference=conference))
+    else:
+        get_conference, get_distances = store.get_conference, \
+                store.get_distances
+        conference_schools = store.conference_schools
     if options.conference is not None:
-        options.conference = Conferences.get(options.conference)
-        options.filter = list(Schools.selectBy(conference=options.conference))
+        options.conference = get_conference(options.conference)
+        options.filter = conference_schools(options.conference)
     else:
-        options.filter = option_parser.parse_schools(options.filter)
+        options.filter = option_parser.parse_schools(options.filter, store)
+    options.source = store or Runners
     if options.dist_limit is None:
         if gender == "M":
-            options.dist_limit = Distances.get(1).mens_distance
+            options.dist_limit = get_distances(1).mens_distance
         else:
-            options.dist_limit = Distances.get(1).womens_distance
+            options.dist_limit = get_distances(1).womens_distance
     return options, (gender,)
 
 @main_function(parse_arguments)
 def main(options, (gender,)):
+    if options.simulate is not None:
+        for row in simulate(gender, options):
+            print row
+        return
     results = assemble_results(gender, options.dist_limit, options.filter,
-                               options.year, options.previous_years)
-    results.score()
+                               options.year, options.previous_years,
+                               options.source)
+    results.score_vectorized()
     if options.exclude_scoreless:
         results.purge_scoreless_runners()
     if options.show_races:
@@ -71,41 +98,55 @@ def main(options, (gender,)):
     for row in ScoreDumper(results.scores):
         print row
 
-def assemble_results(gender, dist_limit, school_filter, year, previous_years):
-    """Assembles results based on the criteria given."""
-    best_times = []
-    query = AND(Runners.q.gender == gender, Affiliations.q.year == year,
-                IN(Affiliations.q.school, school_filter))
-    join = INNERJOINOn(Runners, Affiliations,
-                       Runners.q.id == Affiliations.q.runner)
-    for affiliation in Affiliations.select(query, join=join):
-        runner = affiliation.runner
-        seasons_bests = []
-        for i in xrange(previous_years + 1):
-            try:
-                seasons_bests.append(runner.seasons_best(dist_limit, year - i))
-            except DidNotCompeteError:
-                continue
-        try:
-            best_times.append(min(seasons_bests, key=attrgetter("time")))
-        except ValueError:
-            pass
-    best_times.sort()
-    races = list(set(result.race for result in best_times))
-    for i, race in enumerate(sorted(races, key=attrgetter("date"))):
+def assemble_results(gender, dist_limit, school_filter, year, previous_years,
+                     source=Runners):
+    """Assembles results based on the criteria given.  The season's bests are
+    read from the source, either Runners or a ColumnStore."""
+    best_times = source.seasons_bests(gender, dist_limit, school_filter, year,
+                                      previous_years)
+    races = sorted(set(best.race for best in best_times),
+                   key=attrgetter("date", "id"))
+    for i, race in enumerate(races):
         race.num = i
-    final_results = [Finisher(result.runner.name, result.time,
-                              result.runner.year,
-                              result.runner.school(year).name, result.race.num)
-                     for result in best_times]
+    final_results = [Finisher(best.name, best.time, best.year, best.school,
+                              best.race.num) for best in best_times]
     predicted_results = AggregatedResults(final_results, races)
     return predicted_results
 
-class Finisher(hytek.Finisher):
-    """Minor modification of hytek.Finisher."""
-    def __init__(self, name, time, year, school, race_num):
-        super(Finisher, self).__init__(name, time, year, school)
-        self.race_num = race_num
+def simulate(gender, options):
+    """Simulate races between the runners selected by the options.  Returns a
+    table of each team's place probabilities and score percentiles, ordered by
+    average place."""
+    histories = options.source.performance_histories(gender,
+                                                     options.dist_limit,
+                                                     options.filter,
+                                                     options.year,
+                                                     options.previous_years)
+    #Simulation needs NumPy, so it is imported only when it is used
+    from xcanalyze.simulation import Simulation
+    simulation = Simulation(histories)
+    results = simulation.run(options.simulate, options.seed, options.processes)
+    probabilities = results.place_probabilities()
+    percentiles = results.score_percentiles(SCORE_PERCENTILES)
+    rows = []
+    for i, (school, mean_place) in enumerate(zip(results.schools,
+                                                  results.mean_places())):
+        if mean_place is None:
+            continue
+        row = [school, "%.1f" % mean_place]
+        row += ["%.1f" % (100 * probability) for probability in
+                probabilities[i][:len(results.schools)]]
+        row += ["%.0f" % percentile for percentile in percentiles[i]]
+        rows.append((mean_place, row))
+    rows.sort(key=itemgetter(0))
+    places = len(rows)
+    headings = ["Team", "Mean"] + ["#%d" % (place + 1) for place in
+                                   xrange(places)]
+    headings += ["p%d" % percentile for percentile in SCORE_PERCENTILES]
+    rows = [row[:2 + places] + row[-len(SCORE_PERCENTILES):]
+            for mean_place, row in rows]
+    pads = [None] + [str.rjust] * (len(headings) - 1)
+    return Table([headings] + rows, column_seperator=" | ", pads=pads)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,38 @@
+#!/usr/bin/python
+
+"""Regenerate the seasons_bests table from the results table, in case it has
+fallen out of step with the results, such as after results were changed or
+deleted by hand."""
+
+from miscellaneous import main_function
+from sqlobject import sqlhub
+from time import time
+from xcanalyze.models import SeasonsBests
+
+from common import connect, ConnectionError, OptionParser
+
+def parse_arguments(arguments):
+    """Parse command line arguments.  Returns the tuple (options,
+    arguments)."""
+    option_parser = OptionParser()
+    options, arguments = option_parser.parse_args(arguments[1:])
+    if options.server is None:
+        option_parser.error(OptionParser.NO_SERVER_MESSAGE)
+    try:
+        connect(options.server)
+    except ConnectionError, error:
+        option_parser.error(error)
+    if not SeasonsBests.available():
+        option_parser.error("The database has no seasons_bests table; run "
+                            "migrate.py to create it.")
+    return options, arguments
+
+@main_function(parse_arguments)
+def main(options, arguments):
+    """Rebuild the table in a single transaction."""
+    started = time()
+    rows = sqlhub.doInTransaction(SeasonsBests.rebuild)
+    print "Wrote %d season's bests in %.3f seconds." % (rows, time() - started)
+
+if __name__ == "__main__":
+    main()
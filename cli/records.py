@@ -0,0 +1,66 @@
+"""Readers and writers that handle results one record at a time, so that
+records can be written as soon as they are read and never have to be held in
+memory together.  A record is a dictionary.  Two formats are supported: YAML,
+a single list of records, and JSON Lines, one JSON object per line.  YAML is
+read and written with libyaml when it is available."""
+
+import json
+from yaml import dump, load
+from yaml.error import YAMLError
+try:
+    from yaml import CSafeDumper as SafeDumper, CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeDumper, SafeLoader
+
+def read_records(stream):
+    """Read records from the stream, detecting the format from the first
+    character that is not whitespace: JSON Lines begin with "{".  Returns the
+    tuple (format, records), where records is an iterator.  JSON Lines are
+    parsed one line at a time as the iterator is consumed.  Raises a
+    RecordError, possibly while iterating, if the stream cannot be parsed."""
+    first = stream.read(1)
+    while first.isspace():
+        first = stream.read(1)
+    if first == "{":
+        return "json-lines", read_json_lines(first + stream.readline(), stream)
+    try:
+        records = load(first + stream.read(), Loader=SafeLoader)
+    except YAMLError, error:
+        raise RecordError(error)
+    if records is None:
+        records = []
+    if not isinstance(records, list):
+        raise RecordError("Expected a list of records.")
+    return "yaml", iter(records)
+
+def read_json_lines(first_line, stream):
+    """Generate the record on each line of the stream, following the given
+    first line.  Blank lines are skipped."""
+    for number, line in enumerate(iter_lines(first_line, stream), 1):
+        if line.strip() == "":
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError, error:
+            raise RecordError("Line %d: %s" % (number, error))
+
+def iter_lines(first_line, stream):
+    """Generate the given first line and then each line of the stream."""
+    yield first_line
+    for line in iter(stream.readline, ""):
+        yield line
+
+def write_json_line(record, stream):
+    """Write the record as one line of JSON."""
+    stream.write(json.dumps(record))
+    stream.write("\n")
+
+def write_yaml(record, stream):
+    """Write the record as one item of a YAML sequence.  The records written to
+    a stream together form a single YAML document, a list of records."""
+    stream.write(dump([record], Dumper=SafeDumper))
+
+#The writers by name, for use with the --format options of the scripts
+WRITERS = {"json-lines": write_json_line, "yaml": write_yaml}
+
+class RecordError(Exception): pass
@@ -0,0 +1,192 @@
+#!/usr/bin/python
+
+"""Restore a database from a schema file, such as xca_create.sqlite, and a
+file of INSERT commands, such as restore.sql.  The load is tuned for speed:
+foreign key checks are off, SQLite keeps no rollback journal and does not
+wait for the disk, each table is loaded in one transaction and indexes are
+created after the data.  The row count of every table is checked at the
+end, and the version of every table loaded is bumped so that names cached
+before the restore are looked up again."""
+
+from extensions.collections import OrderedDict
+from formatting import Table
+from itertools import groupby
+from miscellaneous import main_function
+import re
+from sqlobject import connectionForURI
+from sys import stderr
+from time import time
+from xcanalyze.models import TableVersions
+
+from common import OptionParser
+
+#Statements run before and after the load, by database
+TUNING = {"mysql": (["SET foreign_key_checks = 0", "SET unique_checks = 0"],
+                    ["SET unique_checks = 1", "SET foreign_key_checks = 1"]),
+          "sqlite": (["PRAGMA foreign_keys = OFF", "PRAGMA journal_mode = OFF",
+                      "PRAGMA synchronous = OFF"], [])}
+
+#A string, quoted identifier, comment, statement separator or anything else
+TOKEN = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"\\]|\\.)*\"|`[^`]*`|--[^\n]*|;|"
+                   r"[^'\"`;-]+|-")
+CREATE_VERSIONS = re.compile(r"^\s*CREATE\s+TABLE\s+(IF\s+NOT\s+EXISTS\s+)?"
+                             r"[`\"]?%s\b" % TableVersions.sqlmeta.table, re.I)
+CREATE_INDEX = re.compile(r"^\s*CREATE\s+(UNIQUE\s+)?INDEX\b", re.I)
+INSERT = re.compile(r"^\s*INSERT\s+(?:OR\s+\w+\s+)?INTO\s+[`\"]?(\w+)", re.I)
+PARENTHESIS = re.compile(r"[()]")
+TRANSACTION = re.compile(r"^\s*(BEGIN|COMMIT|END|START\s+TRANSACTION)\b",
+                         re.I)
+VALUES = re.compile(r"\bVALUES\b", re.I)
+
+def parse_arguments(arguments):
+    """Parse command line arguments.  Returns the tuple (options, (schema,
+    data)), the contents of the two files."""
+    option_parser = OptionParser("%prog [options] SCHEMA DATA")
+    options, arguments = option_parser.parse_args(arguments[1:])
+    if len(arguments) != 2:
+        option_parser.error("Please specify a schema file and a data file.")
+    if options.server is None:
+        option_parser.error(OptionParser.NO_SERVER_MESSAGE)
+    try:
+        files = []
+        for path in arguments:
+            with open(path) as sql:
+                files.append(sql.read())
+    except EnvironmentError, error:
+        option_parser.error(error)
+    try:
+        options.connection = connectionForURI(options.server)
+    except (AssertionError, KeyError):
+        option_parser.error(options.server + " is not a valid database URI.")
+    return options, tuple(files)
+
+@main_function(parse_arguments)
+def main(options, (schema, data)):
+    """Load the schema and data, then print the time taken by each table and
+    check its row count."""
+    started = time()
+    database = options.connection.getConnection()
+    cursor = database.cursor()
+    before, after = TUNING.get(options.connection.dbName, ([], []))
+    for statement in before:
+        cursor.execute(statement)
+    indexes = []
+    versioned = False
+    for statement, rows in split_statements(schema):
+        if CREATE_INDEX.match(statement):
+            indexes.append(statement)
+        else:
+            cursor.execute(statement)
+            versioned = versioned or bool(CREATE_VERSIONS.match(statement))
+    tables = load(cursor, split_statements(data))
+    if versioned:
+        bump_versions(cursor, tables)
+    index_started = time()
+    for statement in indexes:
+        cursor.execute(statement)
+    index_time = time() - index_started
+    for statement in after:
+        cursor.execute(statement)
+    failed = False
+    rows = []
+    for table, (expected, seconds) in tables.iteritems():
+        cursor.execute("SELECT COUNT(*) FROM %s" % table)
+        found = cursor.fetchone()[0]
+        if found != expected:
+            print >> stderr, "%s has %d rows; expected %d." % (table, found,
+                                                               expected)
+            failed = True
+        rows.append([table, found, "%.3f" % seconds])
+    rows.append(["Indexes (%d)" % len(indexes), None, "%.3f" % index_time])
+    rows.append(["Total", sum(expected for expected, seconds in
+                              tables.itervalues()),
+                 "%.3f" % (time() - started)])
+    pads = [None, str.rjust, str.rjust]
+    for row in Table([["Table", "Rows", "Seconds"]] + rows,
+                     column_seperator=" | ", pads=pads):
+        print row
+    if failed:
+        return 1
+
+def load(cursor, statements):
+    """Execute the statements, running the consecutive INSERTs into each table
+    in one transaction.  Transaction statements in the data are skipped.
+    Returns an ordered dictionary from each table loaded to the tuple (number
+    of rows inserted, seconds taken)."""
+    tables = OrderedDict()
+    statements = ((statement, rows) for statement, rows in statements
+                  if not TRANSACTION.match(statement))
+    for table, group in groupby(statements, key=table_of):
+        started = time()
+        if table is not None:
+            cursor.execute("BEGIN")
+        inserted = 0
+        for statement, rows in group:
+            cursor.execute(statement)
+            inserted += rows
+        if table is not None:
+            cursor.execute("COMMIT")
+            expected, seconds = tables.get(table, (0, 0.0))
+            tables[table] = (expected + inserted,
+                             seconds + time() - started)
+    return tables
+
+def bump_versions(cursor, tables):
+    """Bump the version of each of the tables whose versions are kept, the
+    same as TableVersions.bump, which cannot be used on a raw cursor."""
+    table = TableVersions.sqlmeta.table
+    cursor.execute("BEGIN")
+    for name in TableVersions.tracked.intersection(tables):
+        cursor.execute("UPDATE %s SET version = version + 1 WHERE table_name "
+                       "= '%s'" % (table, name))
+        if cursor.rowcount == 0:
+            cursor.execute("INSERT INTO %s (table_name, version) VALUES "
+                           "('%s', 1)" % (table, name))
+    cursor.execute("COMMIT")
+
+def split_statements(sql):
+    """Generate the tuple (statement, rows) for each statement in the SQL,
+    where rows is the number of rows in the VALUES clause of an INSERT, or 0.
+    Comments are removed."""
+    parts = []
+    rows = depth = 0
+    values = False
+    for token in TOKEN.findall(sql):
+        if token.startswith("--"):
+            continue
+        if token == ";":
+            statement = "".join(parts).strip()
+            if len(statement) > 0:
+                yield statement, rows
+            parts = []
+            rows = depth = 0
+            values = False
+            continue
+        parts.append(token)
+        if token[0] in "'\"`":
+            continue
+        if not values:
+            match = VALUES.search(token)
+            if match is None:
+                continue
+            values = True
+            token = token[match.end():]
+        for parenthesis in PARENTHESIS.findall(token):
+            if parenthesis == "(":
+                if depth == 0:
+                    rows += 1
+                depth += 1
+            else:
+                depth -= 1
+    statement = "".join(parts).strip()
+    if len(statement) > 0:
+        yield statement, rows
+
+def table_of((statement, rows)):
+    """The table an INSERT statement inserts into, or None for any other
+    statement."""
+    match = INSERT.match(statement)
+    return match.group(1) if match is not None else None
+
+if __name__ == "__main__":
+    main()
@@ -3,8 +3,51 @@
 from hytek import ITeam, RaceTime
 from operator import attrgetter, itemgetter
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 class NO_POINTS(object): pass
 
+def seconds(time):
+    """Convert a RaceTime to a number of seconds."""
+    return time.seconds + time.microseconds / 1000000.0
+
+def score_arrays(times, teams):
+    """Score a race given as parallel NumPy arrays of finishing times, in
+    seconds, and team codes, which are small non-negative integers or -1 for
+    runners without a team.  Scoring follows RaceResults.score.  Returns the
+    tuple (order, places, points, scores), where order sorts the finishers by
+    time, places and points are given in that sorted order with points of 0
+    for scoreless runners, and scores is indexed by team code, with teams that
+    have fewer than five runners scoring 0."""
+    order = numpy.argsort(times, kind="mergesort")
+    times = times[order]
+    teams = teams[order]
+    finishers = len(times)
+    places = numpy.searchsorted(times, times, side="left") + 1
+    on_team = teams >= 0
+    team_codes = numpy.where(on_team, teams, 0)
+    sizes = numpy.bincount(teams[on_team], minlength=1)
+    #Position of each runner within their team, in order of finish
+    by_team = numpy.argsort(teams, kind="mergesort")
+    sorted_teams = teams[by_team]
+    team_starts = numpy.searchsorted(sorted_teams, sorted_teams, side="left")
+    team_ranks = numpy.empty(finishers, dtype=int)
+    team_ranks[by_team] = numpy.arange(finishers) - team_starts
+    scoring = on_team & (sizes[team_codes] >= 5)
+    if numpy.count_nonzero(sizes) > 7:
+        scoring &= team_ranks < 7
+    scoring_times = times[scoring]
+    points = numpy.zeros(finishers, dtype=int)
+    points[scoring] = numpy.searchsorted(scoring_times, scoring_times,
+                                         side="left") + 1
+    top_five = scoring & (team_ranks < 5)
+    scores = numpy.bincount(teams[top_five], weights=points[top_five],
+                            minlength=len(sizes)).astype(int)
+    return order, places, points, scores
+
 class RaceResults(object):
     """The results of a race."""
 
@@ -18,7 +61,7 @@ class RaceResults(object):
 
     def purge_scoreless_runners(self):
         """Remove all runners from the results if they did not score."""
-        self.score()
+        self.score_vectorized()
         self.results = [result for result in self.results if result.points not
                         in (NO_POINTS, None)]
 
@@ -62,12 +105,51 @@ class RaceResults(object):
                 result.points = i + 1
             else:
                 result.points = presult.points
-        #Compute the team scores
+        #Convert NO_POINTS to None
+        for result in self.results:
+            if result.points is NO_POINTS:
+                result.points = None
+        self._summarize_teams(teams, lambda team_name, team:
+                              sum(runner.points for runner in team[:5]))
+
+    def score_vectorized(self):
+        """Score the race like score(), computing places, points and team
+        scores with score_arrays.  Falls back to score() if NumPy is not
+        installed."""
+        if numpy is None:
+            return self.score()
+        self.results.sort(key=attrgetter("time"))
+        teams = {}
+        codes = {}
+        for result in self.results:
+            if result.team is not None:
+                try:
+                    teams[result.team].append(result)
+                except KeyError:
+                    teams[result.team] = [result]
+                    codes[result.team] = len(codes)
+        times = numpy.array([seconds(result.time) for result in self.results],
+                            dtype=float)
+        team_codes = numpy.array([codes.get(result.team, -1)
+                                  for result in self.results], dtype=int)
+        order, places, points, scores = score_arrays(times, team_codes)
+        for result, place, points in zip(self.results, places.tolist(),
+                                          points.tolist()):
+            result.place = place
+            result.points = points if points > 0 else None
+        self._summarize_teams(teams, lambda team_name, team:
+                              int(scores[codes[team_name]]))
+
+    def _summarize_teams(self, teams, score):
+        """Make a Team of each of the teams, a dictionary from team name to
+        the team's finishers in order of finish, whose points have been
+        tagged.  score gives the score of a team from its name and
+        finishers.  The teams with scores are placed in order of score, ahead
+        of those without, which are ordered by their average time."""
         with_scores = []
         without_scores = []
         for team_name, team in teams.iteritems():
-            if team[0].points is not NO_POINTS:
-                score = sum(runner.points for runner in team[:5])
+            if team[0].points is not None:
                 top_five = sum((runner.time for runner in team[:5]),
                                RaceTime(0))
                 top_five /= 5
@@ -77,24 +159,17 @@ class RaceResults(object):
                     top_seven /= min(len(team), 7)
                 else:
                     top_seven = None
-                summary = Team(team_name, team, top_five, top_seven, score)
-                with_scores.append(summary)
+                with_scores.append(Team(team_name, team, top_five, top_seven,
+                                        score(team_name, team)))
             else:
                 top_five = sum((runner.time for runner in team), RaceTime(0))
                 top_five /= len(team)
-                top_seven = None
-                summary = Team(team_name, team, top_five, top_seven)
-                without_scores.append(summary)
+                without_scores.append(Team(team_name, team, top_five))
         with_scores.sort(key=attrgetter("score"))
         without_scores.sort(key=attrgetter("top_five"))
         for i, team in enumerate(with_scores):
             team.place = i + 1
-        self._scores = with_scores
-        self._scores += without_scores
-        #Convert NO_POINTS to None
-        for result in self.results:
-            if result.points is NO_POINTS:
-                result.points = None
+        self._scores = with_scores + without_scores
         for team in without_scores:
             team.points = None
 
@@ -0,0 +1,71 @@
+"""A request-scoped identity map that loads related rows in batches."""
+
+from sqlobject import SQLObject
+from sqlobject.classregistry import findClass
+from sqlobject.sqlbuilder import IN
+
+BATCH_SIZE = 500
+
+class Session(object):
+    """Keeps every row loaded during one command in an identity map, keyed by
+    table and id.  Rows referenced through foreign keys are loaded with one
+    query per table (in batches of BATCH_SIZE ids) by prefetch().  Because the
+    session holds a reference to every row it loads, SQLObject's own cache
+    serves later attribute accesses such as result.race without a query for as
+    long as the session is alive."""
+
+    def __init__(self, connection=None):
+        self.connection = connection
+        self.identity_map = {}
+
+    def add(self, *rows):
+        """Add rows loaded elsewhere to the identity map."""
+        for row in rows:
+            self.identity_map.setdefault(type(row), {})[row.id] = row
+
+    def get(self, cls, id_):
+        """Get the row of cls with the given id, querying the database only if
+        it has not already been loaded."""
+        try:
+            return self.identity_map[cls][id_]
+        except KeyError:
+            row = cls.get(id_, connection=self.connection)
+            self.add(row)
+            return row
+
+    def load(self, cls, ids):
+        """Load the rows of cls with the given ids, querying only for those not
+        already in the identity map.  Returns a dictionary from id to row."""
+        loaded = self.identity_map.setdefault(cls, {})
+        ids = set(id_ for id_ in ids if id_ is not None)
+        missing = [id_ for id_ in ids if id_ not in loaded]
+        for i in xrange(0, len(missing), BATCH_SIZE):
+            query = IN(cls.q.id, missing[i:i + BATCH_SIZE])
+            for row in cls.select(query, connection=self.connection):
+                loaded[row.id] = row
+        return dict((id_, loaded[id_]) for id_ in ids if id_ in loaded)
+
+    def prefetch(self, rows, *paths):
+        """Load the rows referenced by the given foreign key paths, such as
+        "race.meet", from each of the given rows.  Returns the rows as a
+        list."""
+        rows = list(rows)
+        self.add(*rows)
+        for path in paths:
+            level = rows
+            for attribute in path.split("."):
+                level = self._prefetch_attribute(level, attribute)
+        return rows
+
+    def _prefetch_attribute(self, rows, attribute):
+        """Load the rows referenced by one foreign key of the given rows."""
+        if len(rows) == 0:
+            return []
+        cls = type(rows[0])
+        if not issubclass(cls, SQLObject):
+            #Rows from a ColumnStore carry their related rows already
+            return [getattr(row, attribute) for row in rows]
+        column = cls.sqlmeta.columns[attribute + "ID"]
+        related = findClass(column.foreignKey, cls.sqlmeta.registry)
+        ids = [getattr(row, column.name) for row in rows]
+        return self.load(related, ids).values()
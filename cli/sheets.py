@@ -0,0 +1,88 @@
+"""Read the results sheets produced by the Hy-tek Meet Manager one line at a
+time, so that a sheet never has to be held in memory as a whole."""
+
+import re
+
+from hytek import Finisher, LoadError, RaceTime
+
+#The column headings that begin the individual results of an event
+HEADING = re.compile(r"^\s*Name\s+(Yr|Year|Age)?\s*(?P<school>School|Team)"
+                     r"\s+(Finals|Time)\b")
+#A line of the individual results, once the school has been split off
+RESULT = re.compile(r"^\s*(\d+|--)\s+(?P<name>.+?)"
+                    r"(\s+(?P<year>FR|SO|JR|SR|GR|\d{1,2}))?\s*$")
+TIME = re.compile(r"^(?P<school>.*?)\s+(?P<time>(\d+:){0,2}\d+(\.\d+)?)"
+                  r"(\s+\d+)?\s*$")
+#Lines that end the individual results of an event
+SECTION_END = re.compile(r"^\s*(Team Scores|Event\s+\d+)", re.IGNORECASE)
+#A year at the start of the school column, where a shifted row has put it
+YEAR_FIRST = re.compile(r"^\s*(FR|SO|JR|SR|GR|\d{1,2})\s")
+#A placed finisher: a line that begins with a place and ends with a time and
+#perhaps points.  Any other line, such as a page header, is boilerplate.
+PLACED = re.compile(r"^\s*\d+\s+\S.*\s(\d+:){1,2}\d+(\.\d+)?(\s+\d+)?\s*$")
+
+def iload(lines):
+    """Generate a Finisher for each finisher in the individual results of the
+    sheet whose lines are given.  The school column is located from the
+    column headings of each section, which may be repeated on every page.
+    Runners without a time, such as those who did not finish, are skipped.
+    Raises a LoadError, once the rest of the sheet has been read, if the
+    sheet has no individual results or if any placed finisher could not be
+    read, as happens when a row is not aligned with the column headings."""
+    school_column = None
+    found = False
+    unread = []
+    for number, line in enumerate(lines, 1):
+        line = line.rstrip("\r\n")
+        heading = HEADING.match(line)
+        if heading is not None:
+            school_column = heading.start("school")
+            found = True
+            continue
+        if SECTION_END.match(line):
+            school_column = None
+            continue
+        if school_column is None:
+            continue
+        runner = time = None
+        if aligned(line, school_column):
+            runner = RESULT.match(line[:school_column])
+            time = TIME.match(line[school_column:])
+        if runner is None or time is None:
+            if PLACED.match(line):
+                unread.append(number)
+            continue
+        yield Finisher(runner.group("name"), RaceTime(parse_time(
+            time.group("time"))), runner.group("year"),
+            time.group("school").strip())
+    if not found:
+        raise LoadError("No individual results found.")
+    if len(unread) > 0:
+        raise LoadError("%d finishers could not be read, on lines %s; they "
+                        "may not be aligned with the column headings." %
+                        (len(unread), ", ".join(map(str, unread))))
+
+def aligned(line, school_column):
+    """Whether a line of the individual results can be split at the school
+    column.  A line shifted to the right leaves spaces before the school,
+    which are trimmed, but one shifted to the left, or a name that runs into
+    the school column, cuts a word in two or pushes the year into the school
+    column."""
+    cut = line[school_column - 1:school_column + 1]
+    if len(cut) == 2 and " " not in cut:
+        return False
+    return YEAR_FIRST.match(line[school_column:]) is None
+
+def irecords(lines):
+    """Same as iload, but generate a dictionary for each finisher, with the
+    keys name, school and time, the time being a number of seconds."""
+    for runner in iload(lines):
+        yield {"name": runner.name, "school": runner.team, "time":
+               runner.time.seconds + runner.time.microseconds / 1000000.0}
+
+def parse_time(string):
+    """Convert a time of the form [[H:]M:]S[.ss] to a number of seconds."""
+    seconds = 0.0
+    for part in string.split(":"):
+        seconds = seconds * 60 + float(part)
+    return seconds
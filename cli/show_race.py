@@ -3,21 +3,22 @@
 """Show the results of a race."""
 
 from datetime import date
-from hytek import Finisher, ResultsDumper, ScoreDumper
+from operator import attrgetter
+from hytek import ResultsDumper, ScoreDumper
 from miscellaneous import main_function
 from sqlobject.main import SQLObjectNotFound
-from sqlobject.sqlbuilder import IN, INNERJOINOn
-from xcanalyze.models import Races, Results, NotAffiliatedError
+from xcanalyze.models import Races, Results
 from xcanalyze.scoring import AggregatedResults
 
-from common import connect, ConnectionError, GenderedOptionParser, \
-        InvalidGenderError, parse_gender, race_display_options, RaceDumper, \
-        SeasonsBestDumper
+from common import ConnectionError, data_source_options, Finisher, \
+        GenderedOptionParser, InvalidGenderError, open_data_source, \
+        parse_gender, race_display_options, RaceDumper, SeasonsBestDumper
 
 def parse_arguments(arguments):
     """Parse command-line arguments.  Returns the tuple (options, (gender,
     races))."""
     option_parser = race_display_options(GenderedOptionParser())
+    data_source_options(option_parser)
     option_parser.set_usage("%prog RACE_ID [RACE_IDS...] [options]")
     option_parser.add_option("-d", "--distance",
                              help="Preferred race distance.", type="int")
@@ -25,16 +26,18 @@ def parse_arguments(arguments):
                              type="int")
     options, arguments = option_parser.parse_args(arguments[1:])
     try:
-        connect(options.server)
+        store = open_data_source(options)
         gender, race_ids = parse_gender(arguments[0]), arguments[1:]
         if len(race_ids) == 0:
             option_parser.error("Please specify at least one race.")
+        options.source = store or Results
+        get_race = Races.get if store is None else store.get_race
         races = [None] * len(race_ids)
         for i, race_id in enumerate(race_ids):
             try:
-                races[i] = Races.get(int(race_id))
+                races[i] = get_race(int(race_id))
             except ValueError:
-                races[i] = Races.get(race_id, options.year)
+                races[i] = get_race(race_id, options.year)
     except ConnectionError, error:
         option_parser.error(error)
     except InvalidGenderError, error:
@@ -46,12 +49,12 @@ def parse_arguments(arguments):
 @main_function(parse_arguments)
 def main(options, (gender, races)):
     """Aggregate the results of the given races."""
-    results = aggregate_races(gender, races)
-    results.score()
+    results = aggregate_races(gender, races, source=options.source)
+    results.score_vectorized()
     if options.exclude_scoreless:
         results.purge_scoreless_runners()
     if options.show_races:
-        for row in RaceDumper(results.races):
+        for row in RaceDumper(results.races, gender):
             print row
         print
         for row in SeasonsBestDumper(results.results, options.distance):
@@ -63,30 +66,18 @@ def main(options, (gender, races)):
     for row in ScoreDumper(results.scores):
         print row
 
-def aggregate_races(gender, races, distance=None):
-    """Aggregate the results of the given races, converting them to the given
-    distance."""
-    if distance is None:
-        distance = races[0].distance
+def aggregate_races(gender, races, source=Results):
+    """Aggregate the results of the given races, keeping each runner's fastest
+    result relative to the race distance.  The results are read from the
+    source, either Results or a ColumnStore.  Each result is numbered with the
+    position of its race among the races sorted by date, the order in which
+    AggregatedResults keeps them and RaceDumper numbers them."""
     year = races[0].date.year
-    join = INNERJOINOn(Results, Races, Results.q.race == Races.q.id)
-    select_by = IN(Results.q.race, races)
-    runners = []
-    results = []
-    distance_query = {"M": Races.q.mens_distance, "F": Races.q.womens_distance}
-    query = Results.select(select_by, join=join, orderBy=Results.q.time /
-                           distance_query[gender])
-    for result in query:
-        runner = result.runner
-        if runner.gender == gender:
-            if runner not in runners:
-                runners.append(runner)
-                try:
-                    school = runner.school(year).name
-                except NotAffiliatedError:
-                    school = None
-                results.append(Finisher(runner.name, result.time, runner.year,
-                                        school))
+    races = sorted(races, key=attrgetter("date"))
+    race_nums = dict((race.id, i) for i, race in enumerate(races))
+    results = [Finisher(result.name, result.time, result.year, result.school,
+                        race_nums[result.race.id])
+               for result in source.fastest(races, gender, year)]
     results = AggregatedResults(results, races)
     return results
 
@@ -2,13 +2,17 @@
 
 """Shows a summary of a runner's performance over their career."""
 
-from formatting import Table
 from miscellaneous import main_function
 from sqlobject import SQLObjectNotFound
 from sys import stderr
 from xcanalyze.models import Results, Runners, TooManyObjectsError
+from xcanalyze.session import Session
 
-from common import connect, ConnectionError, OptionParser
+from common import ConnectionError, data_source_options, \
+        open_data_source, OptionParser, output_options, print_table
+
+HEADINGS = ["date", "meet", "time", "distance"]
+WIDTHS = [10, 30, 8]
 
 def parse_arguments(arguments):
     """Parse command line arguments.  Returns the tuple (options, runners).
@@ -16,15 +20,19 @@ def parse_arguments(arguments):
     option_parser = OptionParser("%prog RUNNER_ID [RUNNER_IDS...]")
     option_parser.add_option("-t", "--sort-times", action="store_true",
                              default=False)
+    data_source_options(option_parser)
+    output_options(option_parser)
     options, runner_ids = option_parser.parse_args(arguments[1:])
     try:
-        connect(options.server)
+        options.store = open_data_source(options)
     except ConnectionError, error:
         option_parser.error(error)
+    get_runner = Runners.get if options.store is None else \
+            options.store.get_runner
     runners = []
     for runner_id in runner_ids:
         try:
-            runners.append(parse_runner(runner_id))
+            runners.append(parse_runner(runner_id, get_runner))
         except (TooManyObjectsError, SQLObjectNotFound), error:
             print >> stderr, error
     return options, runners
@@ -33,18 +41,33 @@ def parse_arguments(arguments):
 def main(options, runners):
     school_format = lambda (school, years): \
             school.name + " (" + ", ".join(map(str, years)) + ")"
+    if options.format != "table":
+        #There is no place for a summary of each runner in these formats, so
+        #each row is labelled with its runner instead
+        rows = ([runner.id] + row for runner in runners
+                for row in iresults(runner, options.sort_times, options.store))
+        print_table(rows, options, ["runner"] + HEADINGS)
+        return 1 if len(runners) == 0 else None
+    source = Runners if options.store is None else options.store
+    histories = source.affiliation_histories(runners)
     for runner in runners:
         print runner.name, "(%d):" % runner.year,
-        print ", ".join(map(school_format, runner.schools().iteritems()))
-        results = iresults(runner, options.sort_times)
-        for result in Table(results, column_seperator=" | "):
-            print result
+        print ", ".join(map(school_format,
+                            histories.get(runner.id, {}).iteritems()))
+        results = iresults(runner, options.sort_times, options.store)
+        print_table(results, options, HEADINGS, WIDTHS)
     if len(runners) == 0:
         return 1
 
-def iresults(runner, sort_times=False):
-    """Generate the rows of the output table."""
-    results = Results.selectBy(runner=runner)
+def iresults(runner, sort_times=False, store=None):
+    """Generate the rows of the output table.  The results are read from the
+    store, if one is given, or from the database."""
+    if store is not None:
+        results = store.results_of(runner.id)
+    else:
+        session = Session()
+        results = session.prefetch(Results.selectBy(runner=runner),
+                                   "race.meet")
     def key(result):
         if sort_times:
             return result.race.distance(runner.gender), result.time
@@ -56,18 +79,19 @@ def iresults(runner, sort_times=False):
         race = result.race
         yield [race.date, race.meet.name, result.time, distances]
 
-def parse_runner(runner):
-    """Parse a runner from the provided string."""
+def parse_runner(runner, get=Runners.get):
+    """Parse a runner from the provided string, finding it with the given
+    function."""
     try:
-        return Runners.get(int(runner))
+        return get(int(runner))
     except ValueError:
         if "," in runner:
             surname, given_name = runner.split(",")
         elif " " in runner:
             given_name, surname = runner.split(" ")
         else:
-            return Runners.get(runner)
-        return Runners.get(surname.strip(), given_name.strip())
+            return get(runner)
+        return get(surname.strip(), given_name.strip())
 
 if __name__ == "__main__":
     main()
@@ -1,55 +1,116 @@
 #!/usr/bin/env python2.6
 
-"""List the members on a team in a particular year."""
+"""List the members of the teams of one or more schools in one or more years,
+with the season's best of each runner, so that the depth charts of a whole
+conference can be read at once.  Every team is read in a single query."""
 
 from datetime import date
-from formatting import Table
-from itertools import count
 from miscellaneous import main_function
-from operator import attrgetter
+import re
 from sqlobject import SQLObjectNotFound
-from xcanalyze.models import Schools, TooManyObjectsError
+from xcanalyze.models import Distances, Schools, TooManyObjectsError
 
-from common import connect, ConnectionError, OptionParser
+from common import ConnectionError, data_source_options, \
+        open_data_source, OptionParser, output_options, print_table
+
+HEADINGS = ["id", "name", "gender", "year", "time"]
+WIDTHS = [5, 30, 1, 4]
+YEARS = re.compile(r"^(\d{4})(-(\d{4}))?$")
 
 def parse_arguments(arguments):
-    """Parse command line arguments.  Returns the tuple (options, (school,)).
+    """Parse command line arguments.  Returns the tuple (options, schools).
     May raise a ConnectionError."""
-    option_parser = OptionParser("%prog SCHOOL")
+    option_parser = OptionParser("%prog SCHOOL [SCHOOLS...]")
     option_parser.add_option("-g", "--sort-by-gender", action="store_true",
                              default=False)
-    option_parser.add_option("-y", "--year", default=date.today().year,
-                             type="int")
+    option_parser.add_option("-t", "--sort-times", action="store_true",
+                             default=False, help="List each team from the "
+                             "fastest season's best to the slowest.")
+    option_parser.add_option("-y", "--years", default=str(date.today().year),
+                             help="The season, or the seasons from FIRST to "
+                             "LAST, of the teams to show.",
+                             metavar="YEAR|FIRST-LAST")
+    option_parser.add_option("--strict", action="store_true",
+                             default=False, help="Consider only races of "
+                             "exactly the standard distance for the season's "
+                             "bests.")
+    data_source_options(option_parser)
+    output_options(option_parser)
     options, arguments = option_parser.parse_args(arguments[1:])
+    match = YEARS.match(options.years)
+    if match is None:
+        option_parser.error("%s is not a year or a range of years." %
+                            options.years)
+    first = int(match.group(1))
+    last = int(match.group(3) or first)
+    if last < first:
+        option_parser.error("The range of years %s is backwards." %
+                            options.years)
+    options.seasons = range(first, last + 1)
     try:
-        connect(options.server)
+        options.store = open_data_source(options)
     except ConnectionError, error:
         option_parser.error(error)
-    index = count()
+    if len(arguments) == 0:
+        option_parser.error("Required argument not provided.")
+    if options.store is None:
+        get_school, get_distances = Schools.get, Distances.get
+    else:
+        get_school, get_distances = options.store.get_school, \
+                options.store.get_distances
     try:
-        school = Schools.get(arguments[next(index)])
+        schools = [get_school(school) for school in arguments]
+        options.distances = get_distances(1)
     except (TooManyObjectsError, SQLObjectNotFound), error:
         option_parser.error(error)
-    except IndexError:
-        option_parser.error("Required argument not provided.")
-    return options, (school,)
+    return options, schools
 
 @main_function(parse_arguments)
-def main(options, (school,)):
-    runners = irunners(school, options.year, options.sort_by_gender)
-    pads = [str.rjust, None, None, None]
-    runners = Table(runners, column_seperator=" | ", pads=pads)
-    for runner in runners:
-        print runner
-
-def irunners(school, year, sort_by_gender=False):
-    """Generate the rows of the output table."""
-    keys = [lambda runner: (runner.surname, runner.given_name),
-            attrgetter("gender")]
-    runners = sorted((runner for runner in school.team(year)),
-                     key=keys[sort_by_gender])
-    for runner in runners:
-        yield runner.id, runner.name, runner.gender, runner.year
+def main(options, schools):
+    source = Schools if options.store is None else options.store
+    roster = source.rosters(schools, options.seasons,
+                            options.distances.mens_distance,
+                            options.distances.womens_distance, options.strict)
+    teams = group_teams(roster, options.sort_by_gender, options.sort_times)
+    if options.format != "table":
+        #There is no place for the name of each team in these formats, so
+        #each row is labelled with its school and season instead
+        rows = ([school.name, season] + row
+                for (school, season), team in teams
+                for row in irows(team, None))
+        print_table(rows, options, ["school", "season"] + HEADINGS)
+        return
+    pads = [str.rjust, None, None, None, None]
+    for (school, season), team in teams:
+        print "%s (%d):" % (school.name, season)
+        print_table(irows(team, ""), options, HEADINGS, WIDTHS, pads)
+
+def group_teams(roster, sort_by_gender=False, sort_times=False):
+    """Split the roster into teams, each sorted by name, or by season's best
+    if sort_times is true, and then by gender if sort_by_gender is true.
+    Returns a list of ((school, season), entries) pairs in the order of the
+    roster."""
+    teams = []
+    for entry in roster:
+        key = entry.school, entry.season
+        if len(teams) == 0 or teams[-1][0] != key:
+            teams.append((key, []))
+        teams[-1][1].append(entry)
+    for key, team in teams:
+        if sort_times:
+            #Runners with no time this season come last
+            team.sort(key=lambda entry: (entry.time is None, entry.time))
+        if sort_by_gender:
+            team.sort(key=lambda entry: entry.runner.gender)
+    return teams
+
+def irows(team, no_time):
+    """Generate the rows of the output table for a team, with no_time in place
+    of the time of runners who did not race."""
+    for entry in team:
+        runner = entry.runner
+        time = entry.time if entry.time is not None else no_time
+        yield [runner.id, runner.name, runner.gender, runner.year, time]
 
 if __name__ == "__main__":
     main()
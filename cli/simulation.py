@@ -0,0 +1,125 @@
+"""Monte-Carlo simulation of races.  Each simulated race draws every runner's
+time from their past performances and is scored with score_arrays."""
+
+from multiprocessing import cpu_count, Pool
+
+import numpy
+
+from scoring import score_arrays
+
+#The number of races simulated by each task handed to the process pool
+CHUNK_SIZE = 2000
+
+class Simulation(object):
+    """Simulates races between runners described by PerformanceHistory
+    instances, each of which has a school and a list of times."""
+
+    def __init__(self, histories):
+        self.histories = histories
+        schools = []
+        codes = {}
+        for history in histories:
+            if history.school not in codes:
+                codes[history.school] = len(schools)
+                schools.append(history.school)
+        self.schools = schools
+        self.teams = numpy.array([codes[history.school]
+                                  for history in histories], dtype=int)
+        self.counts = numpy.array([len(history.times)
+                                   for history in histories], dtype=int)
+        self.offsets = numpy.cumsum(self.counts) - self.counts
+        self.times = numpy.array([time for history in histories
+                                  for time in history.times], dtype=float)
+
+    def run(self, races, seed=None, processes=None):
+        """Simulate the given number of races, split between a pool of the
+        given number of processes (by default, one per CPU).  The results
+        depend only on the seed, not on the number of processes.  Returns a
+        SimulationResults instance."""
+        if seed is None:
+            seed = numpy.random.randint(2 ** 31 - 1)
+        if processes is None:
+            processes = cpu_count()
+        tasks = [(self.times, self.offsets, self.counts, self.teams,
+                  len(self.schools), seed + i,
+                  min(CHUNK_SIZE, races - i * CHUNK_SIZE))
+                 for i in xrange((races + CHUNK_SIZE - 1) // CHUNK_SIZE)]
+        if processes > 1 and len(tasks) > 1:
+            pool = Pool(processes)
+            try:
+                chunks = pool.map(simulate_races, tasks)
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            chunks = map(simulate_races, tasks)
+        places = numpy.vstack([chunk[0] for chunk in chunks])
+        scores = numpy.vstack([chunk[1] for chunk in chunks])
+        return SimulationResults(self.schools, places, scores)
+
+class SimulationResults(object):
+    """The team places and scores from a number of simulated races, as arrays
+    with one row per race and one column per school.  Schools that did not
+    field a scoring team in a race have a place and score of 0."""
+
+    def __init__(self, schools, places, scores):
+        self.schools = schools
+        self.places = places
+        self.scores = scores
+
+    def place_probabilities(self):
+        """The probability of each school finishing in each place, as an array
+        with one row per school and one column per place."""
+        races, schools = self.places.shape
+        probabilities = numpy.zeros((schools, schools))
+        for school in xrange(schools):
+            counts = numpy.bincount(self.places[:, school],
+                                    minlength=schools + 1)
+            probabilities[school] = counts[1:] / float(races)
+        return probabilities
+
+    def mean_places(self):
+        """The average place of each school in the races in which it scored,
+        or None if it never scored."""
+        means = []
+        for school in xrange(len(self.schools)):
+            places = self.places[:, school]
+            places = places[places > 0]
+            means.append(places.mean() if len(places) > 0 else None)
+        return means
+
+    def score_percentiles(self, percentiles):
+        """The given percentiles of the score of each school in the races in
+        which it scored, as a list with one list per school.  Schools that
+        never scored have None for each percentile."""
+        found = []
+        for school in xrange(len(self.schools)):
+            scores = self.scores[:, school]
+            scores = scores[scores > 0]
+            if len(scores) == 0:
+                found.append([None] * len(percentiles))
+            else:
+                found.append([numpy.percentile(scores, percentile)
+                              for percentile in percentiles])
+        return found
+
+def simulate_races((times, offsets, counts, teams, schools, seed, races)):
+    """Simulate the given number of races, drawing each runner's time
+    uniformly from their past performances with a random number generator
+    seeded by the given seed.  Returns the tuple (places, scores) of arrays
+    with one row per race and one column per school.  Teams with tied scores
+    are placed in the order in which their schools were first seen."""
+    random = numpy.random.RandomState(seed)
+    places = numpy.zeros((races, schools), dtype=numpy.int32)
+    scores = numpy.zeros((races, schools), dtype=numpy.int32)
+    sizes = numpy.bincount(teams, minlength=schools)
+    scoring = numpy.flatnonzero(sizes >= 5)
+    for race in xrange(races):
+        draws = (random.random_sample(len(counts)) * counts).astype(int)
+        order, race_places, points, team_scores = \
+                score_arrays(times[offsets + draws], teams)
+        ranking = numpy.argsort(team_scores[scoring], kind="mergesort")
+        ranking = scoring[ranking]
+        places[race, ranking] = numpy.arange(1, len(ranking) + 1)
+        scores[race, scoring] = team_scores[scoring]
+    return places, scores
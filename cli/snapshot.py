@@ -0,0 +1,83 @@
+"""A compact binary file holding a copy of the tables of a ColumnStore, which
+is read by memory-mapping it, so that opening a snapshot costs little more
+than reading its header.
+
+The file starts with the magic string MAGIC, followed by the length of the
+header as an unsigned 64-bit little-endian integer and the header itself, a
+JSON object mapping each table name to its columns.  Each column is described
+by the list [dtype, length, offset], where offset is counted from the first
+multiple of ALIGNMENT after the header.  The columns follow as fixed-width
+records, each starting at a multiple of ALIGNMENT; strings are stored as
+fixed-width byte strings padded with NULs."""
+
+import json
+from mmap import ACCESS_READ, mmap
+from struct import calcsize, pack, unpack
+
+import numpy
+
+ALIGNMENT = 8
+HEADER_LENGTH_FORMAT = "<Q"
+MAGIC = "XCASNAP1"
+
+def align(offset):
+    """Round the offset up to the next multiple of ALIGNMENT."""
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+def read(path):
+    """Map the snapshot at the given path into memory.  Returns a dictionary
+    from table name to a dictionary from column name to a read-only NumPy
+    array backed by the file.  Raises a SnapshotError if the file is not a
+    snapshot."""
+    with open(path, "rb") as snapshot:
+        try:
+            data = mmap(snapshot.fileno(), 0, access=ACCESS_READ)
+        except ValueError:
+            raise SnapshotError("%s is empty." % path)
+    prefix = len(MAGIC) + calcsize(HEADER_LENGTH_FORMAT)
+    if data[:len(MAGIC)] != MAGIC or len(data) < prefix:
+        raise SnapshotError("%s is not a snapshot." % path)
+    header_length, = unpack(HEADER_LENGTH_FORMAT, data[len(MAGIC):prefix])
+    try:
+        header = json.loads(data[prefix:prefix + header_length])
+    except ValueError:
+        raise SnapshotError("%s has a corrupt header." % path)
+    start = align(prefix + header_length)
+    tables = {}
+    for table, columns in header.iteritems():
+        tables[str(table)] = found = {}
+        for column, (dtype, length, offset) in columns.iteritems():
+            dtype = numpy.dtype(str(dtype))
+            if length == 0:
+                found[str(column)] = numpy.zeros(0, dtype)
+                continue
+            if start + offset + length * dtype.itemsize > len(data):
+                raise SnapshotError("%s is truncated." % path)
+            found[str(column)] = numpy.frombuffer(data, dtype, length,
+                                                  start + offset)
+    return tables
+
+def write(tables, path):
+    """Write the tables, a dictionary from table name to a dictionary from
+    column name to NumPy array, to a snapshot at the given path."""
+    header = {}
+    arrays = []
+    offset = 0
+    for table, columns in sorted(tables.iteritems()):
+        header[table] = {}
+        for column, array in sorted(columns.iteritems()):
+            array = numpy.ascontiguousarray(array)
+            header[table][column] = [array.dtype.str, len(array), offset]
+            arrays.append((offset, array))
+            offset = align(offset + array.nbytes)
+    header = json.dumps(header, sort_keys=True)
+    with open(path, "wb") as snapshot:
+        snapshot.write(MAGIC)
+        snapshot.write(pack(HEADER_LENGTH_FORMAT, len(header)))
+        snapshot.write(header)
+        start = align(snapshot.tell())
+        for offset, array in arrays:
+            snapshot.write("\0" * (start + offset - snapshot.tell()))
+            snapshot.write(array.tostring())
+
+class SnapshotError(Exception): pass
@@ -1,84 +1,181 @@
-from datetime import date as Date
+from itertools import islice
+from optparse import OptionParser
 from sqlite3 import connect
+from sys import stdout
 
-def main():
-    connection = connect("example.xca")
-    cursor = connection.cursor()
+# The number of rows in each INSERT command
+BATCH_SIZE = 1000
+INFINITY = float("inf")
+
+TABLES = [
     # Create the states
-    print get_insert_command(cursor, "states", "state_code", "name")
+    ("states", "state_code", "name"),
     # Create the cities
-    print get_insert_command(cursor, "cities", "city_id", "name", "state_code")
+    ("cities", "city_id", "name", "state_code"),
     # Create the conferenes
-    print get_insert_command(cursor, "conferences", "conference_id", "name", "acronym")
+    ("conferences", "conference_id", "name", "acronym"),
     # Get the runners
-    print get_insert_command(cursor, "runners", "runner_id", "surname", "given_name", "gender")
+    ("runners", "runner_id", "surname", "given_name", "gender"),
     # Get the enrollment years
-    print get_insert_command(cursor, "college_enrollment_years", "runner_id", "enrollment_year")
+    ("college_enrollment_years", "runner_id", "enrollment_year"),
     # Get results for unknown races
-    print get_insert_command(cursor, "results_unknown_race", "runner_id", "season", "time")
+    ("results_unknown_race", "runner_id", "season", "time"),
     # Get runner nicknames
-    print get_insert_command(cursor, "runner_nicknames", "runner_id", "nickname")
+    ("runner_nicknames", "runner_id", "nickname"),
     # Get teams
-    print get_insert_command(cursor, "teams", "team_id", "name")
+    ("teams", "team_id", "name"),
     # Get team nicknames
-    print get_insert_command(cursor, "team_nicknames", "team_id", "nickname")
+    ("team_nicknames", "team_id", "nickname"),
     # Get unaffiliated teams
-    print get_insert_command(cursor, "unaffiliated_teams", "team_id")
+    ("unaffiliated_teams", "team_id"),
     # Get conference affiliations
-    print get_insert_command(cursor, "conference_affiliations", "team_id", "conference_id")
+    ("conference_affiliations", "team_id", "conference_id"),
     # Get affiliations
-    print get_insert_command(cursor, "affiliations", "runner_id", "team_id", "season")
+    ("affiliations", "runner_id", "team_id", "season"),
     # Get venues
-    print get_insert_command(cursor, "venues", "venue_id", "name", "city_id")
+    ("venues", "venue_id", "name", "city_id"),
     # Get meets
-    print get_insert_command(cursor, "meets", "meet_id", "name")
+    ("meets", "meet_id", "name"),
     # Get meet hosts
-    print get_insert_command(cursor, "meet_hosts", "meet_id", "team_id")
+    ("meet_hosts", "meet_id", "team_id"),
     # Get meet instances
-    print get_insert_command(cursor, "meet_instances", "meet_id", "date", "venue_id")
+    ("meet_instances", "meet_id", "date", "venue_id"),
     # Get meet instance hosts
-    print get_insert_command(cursor, "meet_instance_hosts", "meet_id", "date", "team_id")
+    ("meet_instance_hosts", "meet_id", "date", "team_id"),
     # Get races
-    print get_insert_command(cursor, "races", "race_id", "distance", "gender", "meet_id", "date")
+    ("races", "race_id", "distance", "gender", "meet_id", "date"),
     # Get results
-    print get_insert_command(cursor, "results", "runner_id", "race_id", "time")
+    ("results", "runner_id", "race_id", "time"),
     # DNFS
-    print get_insert_command(cursor, "did_not_finish", "race_id", "runner_id")
+    ("did_not_finish", "race_id", "runner_id"),
+]
 
-def get_insert_command(cursor, table, *column_list):
+def main():
+    options, arguments = parse_arguments()
+    path = arguments[0] if arguments else "example.xca"
+    connection = connect(path)
+    cursor = connection.cursor()
+    write_dump(stdout, cursor, options.batch_size, options.transaction)
+
+def parse_arguments():
+    option_parser = OptionParser("%prog [options] [DATABASE]")
+    option_parser.add_option("-b", "--batch-size", default=BATCH_SIZE,
+                             type="int", help="Number of rows in each INSERT "
+                             "command (default %d)." % BATCH_SIZE)
+    option_parser.add_option("-t", "--transaction", action="store_true",
+                             default=False, help="Wrap the dump in BEGIN and "
+                             "COMMIT.")
+    options, arguments = option_parser.parse_args()
+    if options.batch_size < 1:
+        option_parser.error("The batch size must be positive.")
+    return options, arguments
+
+def write_dump(output, cursor, batch_size=BATCH_SIZE, transaction=False):
+    """Write INSERT commands for every table to the output as the rows are
+    read, so no table is ever held in memory as a whole."""
+    if transaction:
+        output.write("BEGIN;\n")
+    for table in TABLES:
+        for command in get_insert_commands(cursor, table[0], batch_size,
+                                           *table[1:]):
+            output.write(command.encode("utf-8"))
+            output.write("\n")
+    if transaction:
+        output.write("COMMIT;\n")
+
+def get_insert_commands(cursor, table, batch_size, *column_list):
+    formatters = get_formatters(cursor, table, column_list)
     columns = ", ".join(column_list)
     select = "SELECT %s FROM %s" % (columns, table)
     cursor.execute(select)
-    return insert_command(table, column_list, cursor)
+    return insert_commands(table, column_list, cursor, batch_size, formatters)
+
+def get_formatters(cursor, table, column_list):
+    """Choose a formatter for each of the columns from the types declared in
+    the table's schema."""
+    cursor.execute("PRAGMA table_info(%s)" % table)
+    schema = {}
+    for cid, name, declared_type, not_null, default, primary_key in cursor:
+        schema[name] = column_formatter(declared_type)
+    return [schema.get(column, format_value) for column in column_list]
 
-def insert_command(table, column_list, row_list):
+def column_formatter(declared_type):
+    """The formatter for values of the given declared type, following
+    SQLite's rules for column affinity.  Dates are stored as text.  The
+    declared type is only an affinity, and even a NOT NULL column may hold a
+    value of another type, so every formatter checks the type of the value
+    and falls back to format_value."""
+    declared_type = declared_type.upper()
+    if "INT" in declared_type:
+        return format_integer
+    for name in ("CHAR", "CLOB", "TEXT", "DATE", "TIME"):
+        if name in declared_type:
+            return format_string
+    for name in ("REAL", "FLOA", "DOUB"):
+        if name in declared_type:
+            return format_float
+    return format_value
+
+def insert_commands(table, column_list, row_list, batch_size=BATCH_SIZE,
+                    formatters=None):
+    """Generate one multi-row INSERT command for each batch of rows."""
+    if formatters is None:
+        formatters = [format_value] * len(column_list)
     columns = ", ".join(column_list)
-    rows = ",\n    ".join(map(format_row, row_list))
-    if len(rows) > 0:
-        command = "INSERT INTO %s\n    (%s)\n    VALUES\n    %s;"
-        return command % (table, columns, rows)
-    return "-- No values found for %s" % table
+    command = "INSERT INTO %s\n    (%s)\n    VALUES\n    %s;"
+    row_list = iter(row_list)
+    batch = list(islice(row_list, batch_size))
+    if len(batch) == 0:
+        yield "-- No values found for %s" % table
+    while len(batch) > 0:
+        rows = ",\n    ".join(format_row(formatters, row) for row in batch)
+        yield command % (table, columns, rows)
+        batch = list(islice(row_list, batch_size))
 
-def format_row(value_list):
-    return "(%s)" % ", ".join(map(format_value, value_list))
+def format_row(formatters, value_list):
+    return "(%s)" % ", ".join([format(value) for format, value
+                               in zip(formatters, value_list)])
 
-def format_value(value):
-    try:
-        int_value = int(value)
+def format_integer(value):
+    if isinstance(value, (int, long)):
         return str(value)
-    except:
-        pass
-    try:
-        float_value = float(value)
+    return format_value(value)
+
+def format_float(value):
+    if isinstance(value, float):
+        return format_real(value)
+    return format_value(value)
+
+def format_real(value):
+    """Format a float as an SQL literal.  SQLite has no literal for infinity
+    or NaN, so infinities are written as a number too large for a double,
+    which SQLite reads as infinity, and NaN, which SQLite stores as NULL, is
+    written as NULL."""
+    if value != value:
+        return "NULL"
+    if value in (INFINITY, -INFINITY):
+        return "9e999" if value > 0 else "-9e999"
+    return repr(value)
+
+def format_string(value):
+    if isinstance(value, basestring):
+        return quote(value)
+    return format_value(value)
+
+def quote(string):
+    """Quote a string as an SQL literal, doubling any single quotes."""
+    return "'%s'" % string.replace("'", "''")
+
+def format_value(value):
+    """Format a value of a column whose type is not known from its Python
+    type."""
+    if value is None:
+        return "NULL"
+    if isinstance(value, (int, long)):
         return str(value)
-    except:
-        pass
-    try:
-        date_value = Date(value)
-        return "\"%d-%d-%d\"" % (date_value.year, date_value.month, date_value.day)
-    except:
-        pass
-    return "\"%s\"" % value
+    if isinstance(value, float):
+        return format_real(value)
+    return format_string(unicode(value))
 
 if __name__ == "__main__":
     main()